@@ -0,0 +1,277 @@
+import os
+import sys
+import csv
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+# Benchmarks of the headless core (deck loading, tag selection, answer checking, corrections) on synthetic decks,
+# so that every claim about loading, selection and correction comes with a number measured the same way, without a display.
+#
+# python benchmarks/bench_core.py                          # 10k, 100k and 1M rows
+# python benchmarks/bench_core.py --rows 100000 --only load
+#
+# Every bench_* function gets the paths of a synthetic deck and returns (setup, run): setup prepares one repetition
+# and is not timed, run is timed and gets what setup returned. The minimum and the median of the repetitions are printed.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import (VocabularyIndex, CorrectionJournal, ReviewScheduler, CardPipeline, DirectionKeys, compile_deck, grade_answer, parse_sources,
+                  SourceCache, SelectionSampler, DEFAULT_DIRECTION)
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DATA_CSV = os.path.join(os.path.dirname(script_dir), "resources", "data.csv")
+FIELDNAMES = ["tag", "word_type", "arabic", "english", "arabic_latin", "word_id"]
+
+# Define function writing a deck of the given size with the schema of data.csv: the real rows are repeated with numbered words,
+# the real tags are kept and extra tags are added so that a tag holds about as many rows as in data.csv
+def generate_deck(csv_path, rows, seed=0):
+    with open(DATA_CSV, 'r', encoding='utf-8') as file:
+        templates = list(csv.DictReader(file))
+    tags = sorted({template['tag'] for template in templates})
+    tag_count = max(len(tags), rows * len(tags) // len(templates))
+    tags += ["synthetic " + str(number) for number in range(tag_count - len(tags))]
+    generator = random.Random(seed)
+    with open(csv_path, 'w', encoding='utf-8', newline='') as file:
+        csv_writer = csv.DictWriter(file, fieldnames=FIELDNAMES, lineterminator='\n')
+        csv_writer.writeheader()
+        for row in range(rows):
+            template = templates[row % len(templates)]
+            word = row // 3             # a word appears under a few tags, like in data.csv
+            csv_writer.writerow({
+                'tag': generator.choice(tags),
+                'word_type': template['word_type'],
+                'arabic': template['arabic'] + str(word),
+                'english': template['english'] + " " + str(word),
+                'arabic_latin': template['arabic_latin'] + str(word),
+                'word_id': "bench-" + str(word),
+            })
+
+class Deck:
+
+    def __init__(self, directory, rows):
+
+        """
+        Synthetic deck written once in a temporary directory and shared by the benchmarks of this size.
+
+        Arguments:
+            directory (str): temporary directory
+            rows (int): number of rows
+        """
+
+        self.directory = directory
+        self.rows = rows
+        self.csv_path = os.path.join(directory, "data.csv")
+        self.deck_path = os.path.join(directory, "data.deck")
+        generate_deck(self.csv_path, rows)
+        compile_deck(self.csv_path, self.deck_path)
+        self.vocabulary = VocabularyIndex(self.csv_path, self.deck_path)
+        self.selected_tags = self.vocabulary.get_tags()[:3]
+
+    # Define function splitting the CSV in parts, the first part takes the place of data.csv and the others are given as sources
+    def split_sources(self, parts):
+        directory = os.path.join(self.directory, "sources")
+        paths = [os.path.join(directory, "part" + str(part) + ".csv") for part in range(parts)]
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+            with open(self.csv_path, 'r', encoding='utf-8') as file:
+                header, *lines = file.readlines()
+            size = -(-len(lines) // parts)
+            for part, path in enumerate(paths):
+                with open(path, 'w', encoding='utf-8') as file:
+                    file.write(header)
+                    file.writelines(lines[part * size:(part + 1) * size])
+        return paths
+
+    # Define function copying the CSV and the deck, for the benchmarks writing to them
+    def copy(self, name):
+        directory = os.path.join(self.directory, name)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        csv_path = os.path.join(directory, "data.csv")
+        deck_path = os.path.join(directory, "data.deck")
+        shutil.copyfile(self.csv_path, csv_path)
+        shutil.copyfile(self.deck_path, deck_path)
+        os.utime(deck_path)         # the copy of the deck must not look older than the copy of the CSV
+        return csv_path, deck_path
+
+def bench_load_csv(deck):
+    return None, lambda _: VocabularyIndex(deck.csv_path)
+
+def bench_compile_deck(deck):
+    deck_path = os.path.join(deck.directory, "compiled.deck")
+    return None, lambda _: compile_deck(deck.csv_path, deck_path)
+
+def bench_load_deck(deck):
+    return None, lambda _: VocabularyIndex(deck.csv_path, deck.deck_path)
+
+# the deck split in four CSV files, parsed in a process pool
+def bench_load_4_sources(deck):
+    def setup():
+        shutil.rmtree(os.path.join(deck.directory, "source_cache"), ignore_errors=True)
+    paths = deck.split_sources(4)
+    return setup, lambda _: VocabularyIndex(paths[0], sources=paths[1:])
+
+# same files, unchanged since the last load, taken from the cache
+def bench_load_4_cached_sources(deck):
+    cache_dir = os.path.join(deck.directory, "source_cache")
+    paths = deck.split_sources(4)
+    parse_sources(paths, SourceCache(cache_dir))
+    return None, lambda _: VocabularyIndex(paths[0], sources=paths[1:], cache_dir=cache_dir)
+
+def bench_select_tags(deck):
+    return None, lambda _: deck.vocabulary.select(deck.selected_tags)
+
+def bench_tag_counts(deck):
+    return None, lambda _: deck.vocabulary.tag_counts()
+
+# first lookup of a word_id on a freshly mapped deck, it builds the id index
+def bench_first_id_lookup(deck):
+    def setup():
+        return VocabularyIndex(deck.csv_path, deck.deck_path)
+    return setup, lambda vocabulary: vocabulary.rows_of_id(vocabulary.word_ids[0])
+
+def bench_grade_1000_answers(deck):
+    vocabulary = deck.vocabulary
+    rows = [row % len(vocabulary.word_ids) for row in range(0, 1000 * 7919, 7919)]
+    answers = [vocabulary.arabic_latin_words[row] + "x" for row in rows]       # near misses, the slowest path
+    def run(_):
+        for row, answer in zip(rows, answers):
+            grade_answer(vocabulary.normalized_answers[row], answer)
+    return None, run
+
+# reverse index of a direction, built once per deck; the first call maps the deck again so the build is not cached
+def bench_build_quiz_index(deck):
+    def setup():
+        return VocabularyIndex(deck.csv_path, deck.deck_path)
+    return setup, lambda vocabulary: vocabulary.quiz_index("english_to_arabic")
+
+def bench_grade_1000_english_answers(deck):
+    quiz = deck.vocabulary.quiz_index("arabic_to_english")
+    rows = [row % len(deck.vocabulary.word_ids) for row in range(0, 1000 * 7919, 7919)]
+    answers = ["to " + deck.vocabulary.english_words[row].upper() for row in rows]
+    def run(_):
+        for row, answer in zip(rows, answers):
+            quiz.grade(row, answer)
+    return None, run
+
+def bench_correct_100_words(deck):
+    def setup():
+        csv_path, deck_path = deck.copy("correct")
+        journal = CorrectionJournal(os.path.join(os.path.dirname(csv_path), "data.journal"))
+        return VocabularyIndex(csv_path, deck_path, journal)
+    def run(vocabulary):
+        for row in range(0, len(vocabulary.word_ids), max(1, len(vocabulary.word_ids) // 100))[:100]:
+            vocabulary.correct(row, "corrected")
+        vocabulary.journal.close()
+    return setup, run
+
+# folding 100 corrections back into the CSV and the deck, done when the application closes
+def bench_compact_100_corrections(deck):
+    def setup():
+        csv_path, deck_path = deck.copy("compact")
+        journal = CorrectionJournal(os.path.join(os.path.dirname(csv_path), "data.journal"))
+        vocabulary = VocabularyIndex(csv_path, deck_path, journal)
+        for row in range(0, len(vocabulary.word_ids), max(1, len(vocabulary.word_ids) // 100))[:100]:
+            vocabulary.correct(row, "corrected")
+        return vocabulary
+    return setup, lambda vocabulary: vocabulary.compact()
+
+def bench_schedule_selection(deck):
+    scheduler = ReviewScheduler(os.path.join(deck.directory, "schedule.json"))
+    rows = deck.vocabulary.select([])
+    def run(_):
+        scheduler.start(rows, deck.vocabulary.word_ids)
+        for _ in range(100):
+            scheduler.grade(scheduler.next_row(), True)
+    return None, run
+
+# drilling through 100 cards of the whole deck like the application does: take the prepared card, grade it, prepare the next ones
+def bench_drill_100_cards(deck):
+    scheduler = ReviewScheduler(os.path.join(deck.directory, "schedule.json"))
+    quiz = deck.vocabulary.quiz_index(DEFAULT_DIRECTION)
+    def setup():
+        scheduler.start(deck.vocabulary.select([]), DirectionKeys(deck.vocabulary.word_ids, DEFAULT_DIRECTION))
+        cards = CardPipeline(quiz, scheduler)
+        cards.fill()
+        return cards
+    def run(cards):
+        for number in range(100):
+            card = cards.next()
+            scheduler.grade(card.row, number % 4 != 0)
+            cards.fill()
+    return setup, run
+
+# alias tables of a frequency-weighted selection of every tag, the per-tag tables are kept by the deck after the first build
+def bench_build_frequency_sampler(deck):
+    return None, lambda _: SelectionSampler(deck.vocabulary, [], "frequency")
+
+def bench_draw_10000_rows(deck):
+    sampler = SelectionSampler(deck.vocabulary, [], "frequency")
+    def run(_):
+        for _ in range(10_000):
+            sampler.draw()
+    return None, run
+
+# same drill, the new words drawn with an equal share per tag
+def bench_drill_100_sampled_cards(deck):
+    scheduler = ReviewScheduler(os.path.join(deck.directory, "sampled_schedule.json"))
+    quiz = deck.vocabulary.quiz_index(DEFAULT_DIRECTION)
+    sampler = SelectionSampler(deck.vocabulary, [], "equal_share")
+    def setup():
+        scheduler.start(deck.vocabulary.select([]), DirectionKeys(deck.vocabulary.word_ids, DEFAULT_DIRECTION), sampler)
+        cards = CardPipeline(quiz, scheduler)
+        cards.fill()
+        return cards
+    def run(cards):
+        for number in range(100):
+            card = cards.next()
+            scheduler.grade(card.row, number % 4 != 0)
+            cards.fill()
+    return setup, run
+
+BENCHMARKS = [(name[len("bench_"):], function) for name, function in globals().items() if name.startswith("bench_")]
+
+# Define function timing the run of a benchmark, returns the times of the repetitions in seconds
+def measure(setup, run, repeat):
+    times = []
+    for _ in range(repeat):
+        prepared = setup() if setup is not None else None
+        start = time.perf_counter()
+        run(prepared)
+        times.append(time.perf_counter() - start)
+    return times
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return "{:8.1f} us".format(seconds * 1e6)
+    if seconds < 1:
+        return "{:8.2f} ms".format(seconds * 1e3)
+    return "{:8.3f} s ".format(seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the headless core on synthetic decks")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="sizes of the synthetic decks")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions of each benchmark, fewer are made past 100k rows")
+    parser.add_argument("--only", nargs="+", default=None, help="run the benchmarks whose name contains one of these words")
+    args = parser.parse_args()
+
+    benchmarks = [(name, function) for name, function in BENCHMARKS if args.only is None or any(word in name for word in args.only)]
+    for rows in args.rows:
+        repeat = args.repeat if rows <= 100_000 else max(1, args.repeat // 2)
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            deck = Deck(directory, rows)
+            print("\n" + "{:,}".format(rows) + " rows, " + str(len(deck.vocabulary.get_tags())) + " tags (generated in " + format_time(time.perf_counter() - start).strip() + ")")
+            print("  {:<28} {:>11} {:>11}".format("benchmark", "min", "median"))
+            for name, function in benchmarks:
+                setup, run = function(deck)
+                times = measure(setup, run, repeat)
+                print("  {:<28} {} {}".format(name, format_time(min(times)), format_time(statistics.median(times))))
+            deck.vocabulary.store.close()
+
+if __name__ == "__main__":
+    main()
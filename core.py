@@ -0,0 +1,1576 @@
+# Headless part of the translator: the deck (columnar store, binary deck, corrections journal, tag index), answer checking,
+# the spaced repetition scheduler and the review history. Nothing here needs Tk, translator.py builds the interface on top of it
+# and benchmarks/bench_core.py times it without a display.
+
+import random
+import os               # os.path allows to construct a cross-platform path
+import csv
+import sys
+import mmap             # memory-mapping of the precompiled binary deck
+import struct           # packing and unpacking of the binary deck header and rows
+import json
+import heapq            # priority queue of the cards, ordered by due time
+import time
+import threading
+import queue
+import re
+import bisect
+from array import array         # compact arrays of numbers, used by the columnar word store
+
+# hashlib, pickle, sqlite3 and concurrent.futures are imported where they are used, none of them is needed to show the first frame
+
+####### Instrumentation
+# Timing spans around the hot paths (load, select, check, correct, resize...) and counters of the event loop callbacks.
+# Off by default: a span then costs one attribute check. When on, every span updates its statistics (shown by the overlay of the application)
+# and is kept in a bounded buffer that can be exported as a Chrome trace (chrome://tracing or https://ui.perfetto.dev).
+
+TRACE_CAPACITY = 200_000        # spans kept for the trace export, the oldest are dropped first
+
+class Span:
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+class NullSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Profiler:
+
+    def __init__(self, capacity=TRACE_CAPACITY):
+
+        """
+        Spans and counters of the application, safe to use from the worker threads.
+
+        Arguments:
+            capacity (int): number of spans kept for the trace export
+        """
+
+        from collections import deque
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.events = deque(maxlen=capacity)        # (name, start, duration, thread id), in seconds since origin
+        self.spans = {}                             # name -> [count, total, max, last] in seconds
+        self.counters = {}                          # name -> count
+        self.lock = threading.Lock()
+
+    # Define function returning a context manager timing the block under name
+    def span(self, name):
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    # Define decorator timing every call of a function under name
+    def timed(self, name):
+        def decorator(function):
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with Span(self, name):
+                    return function(*args, **kwargs)
+            wrapper.__name__ = function.__name__
+            wrapper.__doc__ = function.__doc__
+            return wrapper
+        return decorator
+
+    def record(self, name, start, end):
+        duration = end - start
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = [0, 0.0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+            stats[3] = duration
+            self.events.append((name, start - self.origin, duration, threading.get_ident()))
+
+    def count(self, name, value=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        with self.lock:
+            self.events.clear()
+            self.spans.clear()
+            self.counters.clear()
+
+    # Define function returning the statistics as lines of text, spans first by total time
+    def summary(self):
+        with self.lock:
+            spans = sorted(self.spans.items(), key=lambda item: -item[1][1])
+            counters = sorted(self.counters.items())
+        lines = ["{:<22} {:>6} {:>9} {:>9} {:>9}".format("span", "count", "avg ms", "max ms", "last ms")]
+        for name, (count, total, longest, last) in spans:
+            lines.append("{:<22} {:>6} {:>9.2f} {:>9.2f} {:>9.2f}".format(name[:22], count, total / count * 1000, longest * 1000, last * 1000))
+        if counters:
+            lines.append("")
+            lines.append("{:<22} {:>6}".format("counter", "count"))
+            for name, count in counters:
+                lines.append("{:<22} {:>6}".format(name[:22], count))
+        return lines
+
+    # Define function writing the kept spans and the counters as a Chrome trace (JSON object format, times in microseconds)
+    def export_trace(self, path):
+        with self.lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        process_id = os.getpid()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        trace = [{"name": name, "ph": "X", "ts": round(start * 1e6, 1), "dur": round(duration * 1e6, 1), "pid": process_id, "tid": thread_id}
+                 for name, start, duration, thread_id in events]
+        trace += [{"name": "thread_name", "ph": "M", "pid": process_id, "tid": thread_id, "args": {"name": thread_names.get(thread_id, str(thread_id))}}
+                  for thread_id in {event[3] for event in events}]
+        end = round((time.perf_counter() - self.origin) * 1e6, 1)
+        trace += [{"name": name, "ph": "C", "ts": end, "pid": process_id, "args": {"count": count}} for name, count in counters.items()]
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, file)
+        os.replace(temp_path, path)
+        return len(events)
+
+profiler = Profiler()           # shared by the core and the application
+
+class CodedColumn:
+
+    def __init__(self):
+
+        """
+        Column with few distinct values (tag, word_type). Every distinct value is kept once and each row only stores its small integer code.
+        """
+
+        self.values = []            # code -> value
+        self.value_codes = {}       # value -> code
+        self.codes = array('H')     # one unsigned short per row
+
+    # Define function returning the code of a value, adding the value if it was never seen
+    def encode(self, value):
+        code = self.value_codes.get(value)
+        if code is None:
+            code = len(self.values)
+            if code > 0xFFFF and self.codes.typecode == 'H':      # more distinct values than an unsigned short can hold, widening codes
+                self.codes = array('I', self.codes)
+            self.values.append(value)
+            self.value_codes[value] = code
+        return code
+
+    def append(self, value):
+        self.codes.append(self.encode(value))
+
+    def __getitem__(self, index):
+        return self.values[self.codes[index]]
+
+    def __setitem__(self, index, value):
+        self.codes[index] = self.encode(value)
+
+    def __len__(self):
+        return len(self.codes)
+
+class TextColumn:
+
+    def __init__(self):
+
+        """
+        Column of free text (english, arabic_latin, arabic). All the rows are kept utf-8 encoded in one contiguous buffer, each row only stores where its text starts and ends.
+        """
+
+        self.buffer = bytearray()
+        self.starts = array('I')
+        self.ends = array('I')
+
+    def append(self, value):
+        self.starts.append(len(self.buffer))
+        self.buffer += (value or "").encode('utf-8')
+        self.ends.append(len(self.buffer))
+
+    def __getitem__(self, index):
+        return self.buffer[self.starts[index]:self.ends[index]].decode('utf-8')
+
+    # a new value gets written at the end of the buffer, the old bytes are left unused (corrections are rare compared to the size of the deck)
+    def __setitem__(self, index, value):
+        self.starts[index] = len(self.buffer)
+        self.buffer += (value or "").encode('utf-8')
+        self.ends[index] = len(self.buffer)
+
+    def __len__(self):
+        return len(self.starts)
+
+class WordStore:
+
+    def __init__(self):
+
+        """
+        Columnar storage of the deck, replacing one list of separate str objects per CSV column.
+        Every column gives per-row access with column[row], like the lists it replaces.
+        """
+
+        self.tags = CodedColumn()
+        self.word_types = CodedColumn()
+        self.english_words = TextColumn()
+        self.arabic_latin_words = TextColumn()
+        self.arabic_words = TextColumn()
+        self.word_ids = TextColumn()
+        self.normalized_answers = TextColumn()      # arabic_latin passed through normalize_answer
+
+    def append(self, tag, word_type, english, arabic_latin, arabic, word_id, normalized_answer):
+        self.tags.append(tag)
+        self.word_types.append(word_type)
+        self.english_words.append(english)
+        self.arabic_latin_words.append(arabic_latin)
+        self.arabic_words.append(arabic)
+        self.word_ids.append(word_id)
+        self.normalized_answers.append(normalized_answer)
+
+    def __len__(self):
+        return len(self.english_words)
+
+####### Binary deck format
+# The deck gets precompiled from the CSV (python translator.py --compile-deck) into one little-endian file:
+#   header      : magic, version, row count, section count
+#   section table: (offset, length) of each section
+#   sections    : tag list, word_type list, per-tag row ranges (start, count), tag codes, word_type codes,
+#                 then for english, arabic_latin, arabic, word_id and the normalized answer: string offsets (row count + 1) followed by the utf-8 text
+# Rows are sorted by tag, so the rows of each tag are one contiguous range.
+
+DECK_MAGIC = b"TRDK"
+DECK_VERSION = 4
+DECK_HEADER = struct.Struct("<4sHHI")       # magic, version, section count, row count
+DECK_SECTION = struct.Struct("<QQ")         # offset, length
+DECK_SECTION_COUNT = 15
+
+# Define function giving a stable id to a word of the CSV without word_id, the same word under several tags gets the same id like on arwords
+# The word type is part of the key: "love (v)" and "love (n)" share their arabic and english but are two words with two transliterations
+def local_word_id(arabic, english, word_type):
+    import hashlib
+    return "local-" + hashlib.sha1(((arabic or "") + "\0" + (english or "") + "\0" + (word_type or "").strip()).encode('utf-8')).hexdigest()[:12]
+
+# Define function packing an array of numbers as little-endian bytes
+def _array_bytes(values):
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+# Define function building the binary deck next to the CSV, written to a temporary file first so that a failed build never leaves a broken deck
+@profiler.timed("compile deck")
+def compile_deck(csv_path, deck_path):
+    vocabulary = VocabularyIndex(csv_path)
+    tags = vocabulary.get_tags()
+    word_types = vocabulary.word_types.values
+
+    order = array('I')                          # new row order, grouped by tag
+    ranges = array('I')
+    for tag in tags:
+        ranges.append(len(order))
+        ranges.append(len(vocabulary.tag_rows[tag]))
+        order.extend(vocabulary.tag_rows[tag])
+
+    tag_codes = array('H', (code for code, tag in enumerate(tags) for _ in vocabulary.tag_rows[tag]))
+    word_type_codes = array('H', (vocabulary.word_types.codes[row] for row in order))
+
+    sections = [
+        "\0".join(tags).encode('utf-8'),
+        "\0".join(word_types).encode('utf-8'),
+        _array_bytes(ranges),
+        _array_bytes(tag_codes),
+        _array_bytes(word_type_codes),
+    ]
+    for column in (vocabulary.english_words, vocabulary.arabic_latin_words, vocabulary.arabic_words, vocabulary.word_ids, vocabulary.normalized_answers):
+        offsets = array('I', [0])
+        text = bytearray()
+        for row in order:
+            text += column.buffer[column.starts[row]:column.ends[row]]
+            offsets.append(len(text))
+        sections.append(_array_bytes(offsets))
+        sections.append(bytes(text))
+
+    offset = DECK_HEADER.size + DECK_SECTION.size * len(sections)
+    table = bytearray()
+    for section in sections:
+        table += DECK_SECTION.pack(offset, len(section))
+        offset += len(section)
+
+    temp_path = deck_path + ".tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(DECK_HEADER.pack(DECK_MAGIC, DECK_VERSION, len(sections), len(order)))
+        file.write(table)
+        for section in sections:
+            file.write(section)
+    os.replace(temp_path, deck_path)
+    return len(order)
+
+class MappedCodedColumn:
+
+    def __init__(self, deck_map, offset, values):
+
+        """
+        Read-only CodedColumn reading the code of a row straight from the memory-mapped deck.
+        """
+
+        self.map = deck_map
+        self.offset = offset
+        self.values = values
+
+    def __getitem__(self, index):
+        return self.values[struct.unpack_from("<H", self.map, self.offset + 2 * index)[0]]
+
+class MappedTextColumn:
+
+    def __init__(self, deck_map, offsets_offset, text_offset, length):
+
+        """
+        TextColumn reading the text of a row from the memory-mapped deck only when asked for it.
+        Corrections are kept in memory on top of the mapped file.
+        """
+
+        self.map = deck_map
+        self.offsets_offset = offsets_offset
+        self.text_offset = text_offset
+        self.length = length
+        self.overrides = {}         # row -> corrected value
+
+    def __getitem__(self, index):
+        if index in self.overrides:
+            return self.overrides[index]
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        start, end = struct.unpack_from("<II", self.map, self.offsets_offset + 4 * index)
+        return self.map[self.text_offset + start:self.text_offset + end].decode('utf-8')
+
+    def __setitem__(self, index, value):
+        self.overrides[index] = value
+
+    def __len__(self):
+        return self.length
+
+class MappedWordStore:
+
+    def __init__(self, deck_path):
+
+        """
+        WordStore backed by a precompiled binary deck. The file is memory-mapped and rows are read lazily, no text gets parsed at load time.
+
+        Arguments:
+            deck_path (str): path of the binary deck built by compile_deck
+        """
+
+        self.file = open(deck_path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, section_count, self.length = DECK_HEADER.unpack_from(self.map, 0)
+            if magic != DECK_MAGIC or version != DECK_VERSION or section_count != DECK_SECTION_COUNT:
+                raise ValueError("unsupported deck file")
+            sections = [DECK_SECTION.unpack_from(self.map, DECK_HEADER.size + DECK_SECTION.size * k) for k in range(section_count)]
+        except Exception:
+            self.close()
+            raise
+
+        tag_names = self._section(sections[0]).decode('utf-8')
+        word_type_names = self._section(sections[1]).decode('utf-8')
+        self.tag_names = tag_names.split("\0") if tag_names else []
+        self.word_type_names = word_type_names.split("\0") if word_type_names else []
+        ranges = array('I', self._section(sections[2]))
+        if sys.byteorder != "little":
+            ranges.byteswap()
+        self.tag_ranges = {tag: range(ranges[2 * k], ranges[2 * k] + ranges[2 * k + 1]) for k, tag in enumerate(self.tag_names)}
+
+        self.tags = MappedCodedColumn(self.map, sections[3][0], self.tag_names)
+        self.word_types = MappedCodedColumn(self.map, sections[4][0], self.word_type_names)
+        self.english_words = MappedTextColumn(self.map, sections[5][0], sections[6][0], self.length)
+        self.arabic_latin_words = MappedTextColumn(self.map, sections[7][0], sections[8][0], self.length)
+        self.arabic_words = MappedTextColumn(self.map, sections[9][0], sections[10][0], self.length)
+        self.word_ids = MappedTextColumn(self.map, sections[11][0], sections[12][0], self.length)
+        self.normalized_answers = MappedTextColumn(self.map, sections[13][0], sections[14][0], self.length)
+
+    def _section(self, section):
+        offset, length = section
+        return self.map[offset:offset + length]
+
+    def close(self):
+        if getattr(self, 'map', None) is not None:
+            self.map.close()
+        self.file.close()
+
+    def __len__(self):
+        return self.length
+
+class CorrectionJournal:
+
+    def __init__(self, journal_path, sync_every=10):
+
+        """
+        Append-only journal of the corrections made in the application. A correction costs one appended line instead of rewriting the whole CSV,
+        the journal gets replayed over the deck at load time and folded back into the CSV when the application closes.
+
+        Arguments:
+            journal_path (str): path of the journal file
+            sync_every (int): number of corrections written before the journal gets forced to the disk (fsync)
+        """
+
+        self.journal_path = journal_path
+        self.sync_every = sync_every
+        self.file = None            # opened on the first correction
+        self.pending = 0            # corrections written but not yet forced to the disk
+
+    # Define function reading back every complete record, a line cut by a crash in the middle of a write gets ignored
+    def replay(self):
+        records = []
+        try:
+            with open(self.journal_path, 'rb') as file:
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return records
+
+    # Define function appending one record, written as a single line with a single write so that a record is either complete or ignored on replay
+    def append(self, record):
+        if self.file is None:
+            self.file = open(self.journal_path, 'ab')
+            if self._ends_with_torn_line():
+                self.file.write(b"\n")     # ends the cut line, skipped as invalid on replay, rather than writing this record onto it
+        self.file.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+        self.file.flush()
+        self.pending += 1
+        if self.pending >= self.sync_every:
+            self.sync()
+
+    # Define function telling whether the journal ends with a line cut by a crash, i.e. does not end with a newline
+    def _ends_with_torn_line(self):
+        if self.file.tell() == 0:
+            return False
+        with open(self.journal_path, 'rb') as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) != b"\n"
+
+    # Define function forcing the written records to the disk, batched to avoid one fsync per correction
+    def sync(self):
+        if self.file is not None and self.pending:
+            os.fsync(self.file.fileno())
+            self.pending = 0
+
+    def close(self):
+        self.sync()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    # Define function emptying the journal once its records are folded into the CSV
+    def clear(self):
+        self.close()
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+####### Deck sources
+# Several vocabulary files (CSV, JSON, XLSX) can be studied together as one deck. Every file gets parsed into plain rows in its own process,
+# the rows are cached (keyed by the mtime and the size of the file) so an unchanged file is never parsed twice, then the rows are merged
+# in the order of the files: a word already listed under the same tag by an earlier file is skipped.
+
+SOURCE_COLUMNS = ("tag", "word_type", "english", "arabic_latin", "arabic", "word_id")      # order of the arguments of add_row
+SOURCE_KEYS = {             # column -> keys it may have in a file, the arwords listings (data.json) use word, def, ps and chat
+    "tag": ("tag",),
+    "word_type": ("word_type", "ps"),
+    "english": ("english", "def"),
+    "arabic_latin": ("arabic_latin", "chat"),
+    "arabic": ("arabic", "word"),
+    "word_id": ("word_id",),
+}
+SOURCE_DIALECT = "1"                # arwords dia_codes of Lebanese, records listing other dialects only are left out like in csvGenerator.py
+SOURCE_CACHE_VERSION = 3           # changed when the rows change shape, their local ids or the records kept, older cache entries are then parsed again
+
+# Define function writing a word type like data.csv does, " (n)", whether the file says "n", "(n)" or " (n)"
+def normalize_word_type(word_type):
+    word_type = word_type.strip()
+    if word_type and not word_type.startswith("("):
+        word_type = "(" + word_type + ")"
+    return " " + word_type if word_type else ""
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():        # spreadsheets give 9435.0 for the id 9435
+        value = int(value)
+    return str(value).strip()
+
+# Define function turning the records of a file into rows in the order of SOURCE_COLUMNS followed by the normalized answer,
+# so that the normalization is done by the worker process too; a file without tags gets its own name as tag
+# Records without arabic_latin have no answer to check (the chat field of the arwords listings is empty) and are skipped
+def _source_rows(records, default_tag):
+    rows = []
+    for record in records:
+        values = {}
+        for column, keys in SOURCE_KEYS.items():
+            values[column] = next((_cell_text(record[key]) for key in keys if _cell_text(record.get(key))), "")
+        if not values["english"] and not values["arabic"]:        # empty line of a spreadsheet
+            continue
+        if not values["arabic_latin"]:
+            continue
+        if "dia_codes" in record and SOURCE_DIALECT not in _cell_text(record["dia_codes"]).split(","):
+            continue
+        values["tag"] = values["tag"] or default_tag
+        values["word_type"] = normalize_word_type(values["word_type"])
+        values["word_id"] = values["word_id"] or local_word_id(values["arabic"], values["english"], values["word_type"])
+        rows.append(tuple(values[column] for column in SOURCE_COLUMNS) + (normalize_answer(values["arabic_latin"]),))
+    return rows
+
+# Define function parsing one vocabulary file, run in a worker process; XLSX files need openpyxl
+def parse_source(path):
+    name, extension = os.path.splitext(os.path.basename(path))
+    extension = extension.lower()
+    if extension == ".csv":
+        with open(path, 'r', encoding='utf-8-sig', newline='') as file:     # utf-8-sig: files saved by Excel start with a BOM
+            return _source_rows(csv.DictReader(file), name)
+    if extension == ".json":
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if isinstance(data, dict):          # arwords listing, {"Records": [...]}
+            data = data.get("Records") or []
+        return _source_rows(data, name)
+    if extension == ".xlsx":
+        try:
+            import openpyxl
+        except ImportError:
+            raise ImportError("openpyxl is needed to read " + path)
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet_rows = workbook.active.iter_rows(values_only=True)
+            header = [_cell_text(cell) for cell in next(sheet_rows, ())]
+            return _source_rows((dict(zip(header, sheet_row)) for sheet_row in sheet_rows), name)
+        finally:
+            workbook.close()
+    raise ValueError("Unknown deck format: " + path)
+
+class SourceCache:
+
+    def __init__(self, cache_dir):
+
+        """
+        Rows parsed from each vocabulary file, one pickle per file, valid as long as the mtime and the size of the file are unchanged.
+
+        Arguments:
+            cache_dir (str): folder of the cache, created when the first entry is written
+        """
+
+        self.cache_dir = cache_dir
+
+    def _path(self, source_path):
+        import hashlib
+        return os.path.join(self.cache_dir, hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest() + ".pickle")
+
+    def _stamp(self, source_path):
+        status = os.stat(source_path)
+        return (SOURCE_CACHE_VERSION, status.st_mtime_ns, status.st_size)
+
+    # Define function returning the cached rows of a file, None when the file changed or was never cached
+    def get(self, source_path):
+        import pickle
+        try:
+            with open(self._path(source_path), 'rb') as file:
+                stamp, rows = pickle.load(file)
+            if stamp == self._stamp(source_path):
+                return rows
+        except Exception:
+            pass
+        return None
+
+    # Define function caching the rows of a file, written to a temporary file first like the other state files
+    def put(self, source_path, rows):
+        import pickle
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(source_path)
+        with open(path + ".tmp", 'wb') as file:
+            pickle.dump((self._stamp(source_path), rows), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+# Define function returning the rows of every file, in the order of the paths; the files missing from the cache are parsed in a process pool
+# A file that can't be read is reported and gives no rows
+@profiler.timed("parse sources")
+def parse_sources(paths, cache=None, workers=None):
+    parsed = {}
+    missing = []
+    for path in paths:
+        rows = cache.get(path) if cache is not None else None
+        if rows is None:
+            missing.append(path)
+        else:
+            parsed[path] = rows
+
+    if len(missing) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers or min(len(missing), os.cpu_count() or 1)) as executor:
+            futures = [(path, executor.submit(parse_source, path)) for path in missing]
+            results = []
+            for path, future in futures:
+                try:
+                    results.append((path, future.result()))
+                except Exception as e:
+                    print("Deck source not loaded: " + path + ": " + str(e))
+    else:
+        results = []
+        for path in missing:            # a single file is parsed here, starting a process would cost more than it saves
+            try:
+                results.append((path, parse_source(path)))
+            except Exception as e:
+                print("Deck source not loaded: " + path + ": " + str(e))
+
+    for path, rows in results:
+        parsed[path] = rows
+        if cache is not None:
+            try:
+                cache.put(path, rows)
+            except Exception as e:
+                print("Deck source not cached: " + path + ": " + str(e))
+    return [parsed.get(path, []) for path in paths]
+
+class VocabularyIndex:
+
+    def __init__(self, csv_path, deck_path=None, journal=None, sources=None, cache_dir=None):
+
+        """
+        Read the vocabulary a single time and keep its rows in memory, grouped by tag.
+        TagSelector and TranslatorApp both use this index, so switching tag sets never goes back to the disk.
+        When an up to date binary deck exists it gets memory-mapped instead of parsing the CSV.
+
+        With other sources, the CSV and the sources are parsed (in parallel, cached) and merged into one deck in memory instead.
+
+        Corrections recorded in the journal are replayed over the loaded deck.
+
+        Arguments:
+            csv_path (str): path of the vocabulary CSV
+            deck_path (str): path of the precompiled binary deck, optional
+            journal (CorrectionJournal): journal of the corrections, optional
+            sources (list): paths of other CSV, JSON or XLSX vocabulary files studied with the CSV, optional
+            cache_dir (str): folder caching the parsed sources, optional
+        """
+
+        self.csv_path = csv_path
+        self.deck_path = deck_path
+        self.journal = journal
+        self.sources = list(sources or [])
+        self.cache_dir = cache_dir
+        self.quiz_lock = threading.Lock()   # quiz indexes are built in a worker thread while corrections come from the event loop
+
+        self.load()
+        self.replay_journal()
+
+    # Define function loading the binary deck when it is up to date, the CSV otherwise, or every source merged when there are other sources
+    @profiler.timed("deck load")
+    def load(self):
+        if self.sources:
+            self._init_data()
+            self.load_sources_data()
+            return
+        if self.deck_is_current():
+            try:
+                self.load_deck()
+                return
+            except Exception as e:
+                print("Binary deck not loaded, reading CSV instead: " + str(e))
+
+        self._init_data()
+        self.load_csv_data()
+
+    # Define function checking that the binary deck exists and is not older than the CSV
+    def deck_is_current(self):
+        if not self.deck_path or not os.path.exists(self.deck_path):
+            return False
+        if getattr(sys, 'frozen', False):       # PyInstaller unpacks both files at launch with new dates, the bundled deck was built from the bundled CSV
+            return True
+        if not os.path.exists(self.csv_path):
+            return True
+        return os.path.getmtime(self.deck_path) >= os.path.getmtime(self.csv_path)
+
+    # Define function memory-mapping the binary deck, only the tag ranges get read at load time
+    def load_deck(self):
+        self._use_store(MappedWordStore(self.deck_path))
+        self.tag_rows = dict(self.store.tag_ranges)
+        self.id_rows = None          # built on the first lookup, reading every id of the mapped file is left out of the load
+
+    # Defining internal function: internal data structures to be used
+    def _init_data(self):
+        self._use_store(WordStore())
+        self.tag_rows = {}           # dictionary taking a unique tag as a key and the array (or range) of its row numbers as its value
+        self.id_rows = {}            # hash index taking a word_id as a key and the list of its row numbers (one per tag holding the word) as its value
+
+    def _use_store(self, store):
+        self.store = store           # columns of the deck, the position in these columns is the row number
+        self.quiz_indexes = {}       # quiz direction -> QuizIndex
+        self.corrected_rows = []     # rows changed by a correction, in order, replayed over a quiz index whose build overlapped them
+        self.frequency_tables = {}   # tag -> AliasTable of its rows weighted by the frequency of their words
+        self.word_frequencies = None # word_id -> weight, from the frequency tags
+        self.tags = self.store.tags
+        self.word_types = self.store.word_types
+        self.english_words = self.store.english_words
+        self.arabic_latin_words = self.store.arabic_latin_words
+        self.arabic_words = self.store.arabic_words
+        self.word_ids = self.store.word_ids
+        self.normalized_answers = self.store.normalized_answers
+
+    # Define CSV loading data, this is the only place where the whole file gets parsed
+    def load_csv_data(self):
+        try:
+            with open(self.csv_path, mode = 'r', encoding='utf-8') as file:     # mode = 'r' indicate that the file is being read # with ensures that the file gets closed at the end of the block # encoding utf-8 to read arabic letters
+                csv_reader = csv.DictReader(file)                               # DictReader reads the file as a dictionary (takes into account headers)
+                for row in csv_reader:
+                    self.add_row(row.get('tag'), row.get('word_type'), row.get('english'), row.get('arabic_latin'), row.get('arabic'), row.get('word_id'))
+
+        except:
+            print("CSV file not found - using sample data")     # putting sample data if there is a problem when reading the CSV
+            self._init_data()
+            for _ in range(3):
+                self.add_row("1: most frequent", "P", "Hello", "Marhaba", "مرحبا", "")
+
+    # Define function merging the rows of the CSV and of the other sources, the first file listing a word under a tag wins
+    def load_sources_data(self):
+        cache = SourceCache(self.cache_dir) if self.cache_dir else None
+        seen = set()            # (tag, arabic, english) of the files already merged, the rows of one file are all kept like when the CSV is loaded alone
+        for rows in parse_sources([self.csv_path] + self.sources, cache):
+            added = set()
+            for tag, word_type, english, arabic_latin, arabic, word_id, normalized_answer in rows:
+                key = (tag, arabic, english)
+                if key in seen:
+                    continue
+                added.add(key)
+                self.add_row(tag, word_type, english, arabic_latin, arabic, word_id, normalized_answer)
+            seen |= added
+
+    # Define function appending one row to the deck, to the list of rows of its tag and to the rows of its word_id
+    def add_row(self, tag, word_type, english, arabic_latin, arabic, word_id, normalized_answer=None):
+        word_id = word_id or local_word_id(arabic, english, word_type)
+        if normalized_answer is None:
+            normalized_answer = normalize_answer(arabic_latin)
+        row = len(self.store)
+        self.tag_rows.setdefault(tag, array('I')).append(row)
+        self.id_rows.setdefault(word_id, []).append(row)
+        self.store.append(tag, word_type, english, arabic_latin, arabic, word_id, normalized_answer)
+
+    # Define function returning the rows of a word_id in O(1), the same word can be listed under several tags
+    def rows_of_id(self, word_id):
+        if self.id_rows is None:
+            self.id_rows = {}
+            for row in range(len(self.store)):
+                self.id_rows.setdefault(self.word_ids[row], []).append(row)
+        return self.id_rows.get(word_id, [])
+
+    # Define function applying the journal records over the deck that was just loaded
+    @profiler.timed("journal replay")
+    def replay_journal(self):
+        if self.journal is None:
+            return
+        for record in self.journal.replay():
+            for row in self.rows_of_id(record.get('word_id')):
+                self._set_arabic_latin(row, record.get('arabic_latin'))
+
+    # Define function correcting the arabic_latin of a word, the journal gets written before the deck in memory is changed
+    def correct(self, row, arabic_latin):
+        record = self.apply_correction(row, arabic_latin)
+        if self.journal is not None:
+            self.journal.append(record)
+
+    # Define function changing the rows of the word in memory only, returns the journal record so that the caller may write it elsewhere (e.g. in a worker thread)
+    # word_rows are the rows of the word when the caller looked them up already, e.g. in a worker thread since the first lookup reads every id of a mapped deck
+    @profiler.timed("apply correction")
+    def apply_correction(self, row, arabic_latin, word_rows=None):
+        word_id = self.word_ids[row]
+        for word_row in (self.rows_of_id(word_id) if word_rows is None else word_rows):
+            self._set_arabic_latin(word_row, arabic_latin)
+        return self.correction_record(row, arabic_latin)
+
+    # Define function returning the journal record of a correction, it only needs the word_id of the row
+    def correction_record(self, row, arabic_latin):
+        return {"word_id": self.word_ids[row], "arabic_latin": arabic_latin}
+
+    def _set_arabic_latin(self, row, arabic_latin):
+        self.arabic_latin_words[row] = arabic_latin
+        self.normalized_answers[row] = normalize_answer(arabic_latin)
+        with self.quiz_lock:
+            self.corrected_rows.append(row)
+            for quiz_index in self.quiz_indexes.values():      # the reverse indexes built so far follow the correction
+                quiz_index.refresh_row(row)
+
+    # Define function returning the alias table of the rows of a tag weighted by word frequency, built on first use and kept for the deck
+    def frequency_table(self, tag):
+        if self.word_frequencies is None:
+            self.word_frequencies = {}
+            for frequency_tag, weight in FREQUENCY_TAG_WEIGHTS.items():
+                for row in self.tag_rows.get(frequency_tag, ()):
+                    word_id = self.word_ids[row]
+                    self.word_frequencies[word_id] = max(weight, self.word_frequencies.get(word_id, 0))
+        if tag not in self.frequency_tables:
+            self.frequency_tables[tag] = AliasTable([self.word_frequencies.get(self.word_ids[row], DEFAULT_FREQUENCY_WEIGHT) for row in self.tag_rows[tag]])
+        return self.frequency_tables[tag]
+
+    # Define function returning the reverse index of a quiz direction, built on first use and kept for the deck
+    # The build runs without the lock, the corrections made meanwhile are replayed over the new index before it gets added
+    def quiz_index(self, direction):
+        if direction not in self.quiz_indexes:
+            with self.quiz_lock:
+                start = len(self.corrected_rows)
+            with profiler.span("quiz index build"):
+                quiz_index = QuizIndex(self, direction)
+            with self.quiz_lock:
+                for row in self.corrected_rows[start:]:
+                    quiz_index.refresh_row(row)
+                self.quiz_indexes.setdefault(direction, quiz_index)
+        return self.quiz_indexes[direction]
+
+    # Define function folding the journal back into the CSV (and the binary deck), called when the application closes
+    # Corrections of words that are only in other sources stay in the journal
+    # The new CSV is written to a temporary file and swapped in with os.replace, so a crash leaves either the old or the new file, never half of one
+    @profiler.timed("compact")
+    def compact(self):
+        if self.journal is None:
+            return
+        self.journal.close()
+        corrections = {}
+        for record in self.journal.replay():
+            corrections[record.get('word_id')] = record.get('arabic_latin')
+        if not corrections or not os.path.exists(self.csv_path):
+            return
+
+        temp_path = self.csv_path + ".tmp"
+        with open(self.csv_path, 'r', encoding='utf-8') as source, open(temp_path, 'w', encoding='utf-8', newline='') as file:
+            csv_reader = csv.DictReader(source)
+            fieldnames = list(csv_reader.fieldnames)
+            if 'word_id' not in fieldnames:
+                fieldnames.append('word_id')
+            csv_writer = csv.DictWriter(file, fieldnames=fieldnames, lineterminator='\n')
+            csv_writer.writeheader()
+            folded = set()
+            for row in csv_reader:
+                if not row.get('word_id'):          # rows without word_id get their local id written down
+                    row['word_id'] = local_word_id(row.get('arabic'), row.get('english'), row.get('word_type'))
+                if row['word_id'] in corrections:
+                    row['arabic_latin'] = corrections[row['word_id']]
+                    folded.add(row['word_id'])
+                csv_writer.writerow(row)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.csv_path)
+
+        if self.deck_path and os.path.exists(self.deck_path):
+            if isinstance(self.store, MappedWordStore):     # the mapped file has to be released before it gets replaced
+                self.store.close()
+            compile_deck(self.csv_path, self.deck_path)
+        self.journal.clear()
+        for word_id, arabic_latin in corrections.items():
+            if word_id not in folded:
+                self.journal.append({"word_id": word_id, "arabic_latin": arabic_latin})
+        self.journal.close()
+
+    # Define function returning the number of rows of every tag, without reading any row
+    def tag_counts(self):
+        return {tag: len(rows) for tag, rows in self.tag_rows.items()}
+
+    # Define function to get list of unique tags
+    def get_tags(self):
+        return sorted(self.tag_rows)     # sorted to order alphabetically
+
+    # Define function returning the row numbers of the selected tags, taken from memory
+    @profiler.timed("select")
+    def select(self, selected_tags):
+        if not selected_tags:                       # if nothing gets chosen choose everything
+            return range(len(self.store))
+        rows = array('I')
+        for tag in selected_tags:
+            rows.extend(self.tag_rows.get(tag, ()))
+        return rows
+
+####### Answer normalization
+# Transliterations of the same word are written in many ways (3an, khDarr, byaDD...). Both the expected answer and the typed answer
+# are brought to one canonical form before comparing them: lower case, Arabizi digits and digraphs spelled one way, no separators,
+# no doubled letters. The expected answers are normalized once, when the deck is loaded (or compiled).
+
+ANSWER_EQUIVALENCES = [
+    ("’", "'"),
+    ("3'", "gh"), ("8", "gh"),
+    ("7'", "kh"), ("5", "kh"),
+    ("'", "2"),                 # hamza
+    ("ch", "sh"),
+    ("9", "q"),
+    ("6", "t"),
+]
+NEAR_MISS_DISTANCE = 1
+ANSWER_SEPARATORS = re.compile(r"[\s\-_.,]+")
+DOUBLED_LETTERS = re.compile(r"(.)\1+")
+
+# Define function returning the canonical form of a transliteration
+def normalize_answer(text):
+    text = (text or "").strip().lower()
+    for written, canonical in ANSWER_EQUIVALENCES:
+        text = text.replace(written, canonical)
+    text = ANSWER_SEPARATORS.sub("", text)
+    return DOUBLED_LETTERS.sub(r"\1", text)
+
+# Define function returning the edit distance between two answers, or limit + 1 as soon as it is known to be over limit
+# Only the band of width 2 * limit + 1 around the diagonal is computed
+def bounded_edit_distance(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [limit + 1] * len(b)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[len(b)], limit + 1)
+
+ANSWER_CORRECT = "correct"
+ANSWER_NEAR_MISS = "near miss"      # one letter away from the answer
+ANSWER_WRONG = "wrong"
+
+# Define function grading a typed answer against the normalized expected answer
+def grade_answer(expected, user_input):
+    given_answer = normalize_answer(user_input)
+    if given_answer == expected:
+        return ANSWER_CORRECT
+    if bounded_edit_distance(given_answer, expected, NEAR_MISS_DISTANCE) <= NEAR_MISS_DISTANCE:
+        return ANSWER_NEAR_MISS
+    return ANSWER_WRONG
+
+####### Quiz directions
+# A card shows the prompt column, expects the answer column and shows the hint column with the answer. English answers are
+# split in glosses ("about, above" accepts both), Arabic script answers ignore diacritics and the forms of alef, ya and ta marbuta.
+# Each direction has a reverse index from every normalized answer to the rows it answers, so an answer that belongs to another row
+# with the same prompt (telephone: تلفن or تلفون) is accepted. The index is an array of sorted answer hashes searched with bisect:
+# O(log n) per lookup instead of the O(1) of a dictionary, for 12 bytes per answer instead of Python objects for every row of the deck.
+
+QUIZ_DIRECTIONS = {             # direction -> (label, prompt column, answer column, hint column), columns are attributes of VocabularyIndex
+    "english_to_latin": ("English → Arabic (latin)", "english_words", "arabic_latin_words", "arabic_words"),
+    "latin_to_english": ("Arabic (latin) → English", "arabic_latin_words", "english_words", "arabic_words"),
+    "english_to_arabic": ("English → Arabic script", "english_words", "arabic_words", "arabic_latin_words"),
+    "arabic_to_english": ("Arabic script → English", "arabic_words", "english_words", "arabic_latin_words"),
+}
+DEFAULT_DIRECTION = "english_to_latin"
+
+ENGLISH_REMARKS = re.compile(r"\(.*?\)|\[.*?\]")        # "loose [with clothes]"
+ENGLISH_GLOSS_SEPARATORS = re.compile(r"[,;/]")
+ENGLISH_FILLERS = re.compile(r"^(?:to|a|an|the) ")      # "to avoid" and "avoid" are the same answer
+ARABIC_MARKS = re.compile("[\u064B-\u0652\u0670\u0640]")   # harakat, shadda, sukun, dagger alef, tatweel
+ARABIC_LETTER_FORMS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي"})
+
+# Define function returning the canonical form of an English answer
+def normalize_english(text):
+    text = ENGLISH_REMARKS.sub(" ", (text or "").lower())
+    return ENGLISH_FILLERS.sub("", " ".join(re.findall(r"[\w']+", text)))
+
+# Define function returning the canonical forms of every gloss of an English answer
+def english_glosses(text):
+    text = ENGLISH_REMARKS.sub(" ", text or "")
+    return tuple(gloss for gloss in (normalize_english(part) for part in ENGLISH_GLOSS_SEPARATORS.split(text)) if gloss)
+
+# Define function returning the canonical form of an answer in Arabic script
+def normalize_arabic(text):
+    return ANSWER_SEPARATORS.sub("", ARABIC_MARKS.sub("", text or "").translate(ARABIC_LETTER_FORMS))
+
+# column -> (normalization of a typed answer, normalized forms of a cell)
+COLUMN_NORMALIZERS = {
+    "english_words": (normalize_english, english_glosses),
+    "arabic_latin_words": (normalize_answer, lambda text: (normalize_answer(text),)),
+    "arabic_words": (normalize_arabic, lambda text: (normalize_arabic(text),)),
+}
+
+class QuizIndex:
+
+    def __init__(self, vocabulary, direction):
+
+        """
+        Reverse index of a quiz direction over the whole deck: every normalized answer mapped to the rows it answers, kept as two arrays
+        sorted by the hash of the answer rather than as one Python object per row. The normalized prompts and answers of a row are
+        computed when a card gets graded, the default direction reads its answers from the normalized_answers column of the deck.
+        Built once per deck, rows changed by a correction go to a small dictionary next to the arrays.
+
+        Arguments:
+            vocabulary (VocabularyIndex): deck
+            direction (str): key of QUIZ_DIRECTIONS
+        """
+
+        self.vocabulary = vocabulary
+        self.direction = direction
+        self.label, self.prompt_column, self.answer_column, self.hint_column = QUIZ_DIRECTIONS[direction]
+        self.normalize_input = COLUMN_NORMALIZERS[self.answer_column][0]
+        hashes = array('q')
+        rows = array('I')
+        for row in range(len(vocabulary.store)):
+            for key in self.answer_keys(row):
+                hashes.append(hash(key))
+                rows.append(row)
+        order = sorted(range(len(hashes)), key=hashes.__getitem__)
+        self.answer_hashes = array('q', (hashes[position] for position in order))     # sorted hashes of the normalized answers
+        self.answer_rows = array('I', (rows[position] for position in order))         # row answered by each hash
+        self.refreshed_rows = {}        # normalized answer -> rows given it by a correction, not in the arrays
+
+    def _cell_keys(self, column, row):
+        if column == "arabic_latin_words":          # normalized when the deck was loaded (or compiled)
+            return (self.vocabulary.normalized_answers[row],)
+        return COLUMN_NORMALIZERS[column][1](getattr(self.vocabulary, column)[row])
+
+    # Define function returning the normalized answers of a row
+    def answer_keys(self, row):
+        return self._cell_keys(self.answer_column, row)
+
+    # Define function returning the normalized prompts of a row
+    def prompt_keys(self, row):
+        return set(self._cell_keys(self.prompt_column, row))
+
+    # Define function returning the rows a normalized answer is right for, an entry of the arrays whose row changed since (or a hash collision) is checked away
+    def rows_of_answer(self, key):
+        key_hash = hash(key)
+        position = bisect.bisect_left(self.answer_hashes, key_hash)
+        rows = []
+        while position < len(self.answer_hashes) and self.answer_hashes[position] == key_hash:
+            rows.append(self.answer_rows[position])
+            position += 1
+        rows.extend(self.refreshed_rows.get(key, ()))
+        return [row for row in rows if key in self.answer_keys(row)]
+
+    # Define function indexing a row again after its content changed
+    def refresh_row(self, row):
+        if self.answer_column != "arabic_latin_words":
+            return
+        for key in self.answer_keys(row):
+            self.refreshed_rows.setdefault(key, []).append(row)
+
+    def prompt(self, row):
+        return getattr(self.vocabulary, self.prompt_column)[row]
+
+    def answer(self, row):
+        return getattr(self.vocabulary, self.answer_column)[row]
+
+    def hint(self, row):
+        return getattr(self.vocabulary, self.hint_column)[row]
+
+    # Define function grading a typed answer: right for the row, or right for another row sharing a prompt with it (synonym), then near miss
+    @profiler.timed("grade answer")
+    def grade(self, row, user_input):
+        given_answer = self.normalize_input(user_input)
+        if not given_answer:
+            return ANSWER_WRONG
+        answer_keys = self.answer_keys(row)
+        if given_answer in answer_keys:
+            return ANSWER_CORRECT
+        prompt_keys = self.prompt_keys(row)
+        for other_row in self.rows_of_answer(given_answer):
+            if not prompt_keys.isdisjoint(self._cell_keys(self.prompt_column, other_row)):
+                return ANSWER_CORRECT
+        if any(bounded_edit_distance(given_answer, key, NEAR_MISS_DISTANCE) <= NEAR_MISS_DISTANCE for key in answer_keys):
+            return ANSWER_NEAR_MISS
+        return ANSWER_WRONG
+
+class DirectionKeys:
+
+    def __init__(self, word_ids, direction):
+
+        """
+        Scheduling keys of the rows for a quiz direction: the word_id, followed by the direction for the directions other than the default one,
+        so each direction has its own spaced repetition state and the states saved before the directions existed stay valid.
+
+        Arguments:
+            word_ids: column of the word_ids
+            direction (str): key of QUIZ_DIRECTIONS
+        """
+
+        self.word_ids = word_ids
+        self.suffix = "" if direction == DEFAULT_DIRECTION else "|" + direction
+
+    def __getitem__(self, row):
+        return self.word_ids[row] + self.suffix
+
+####### Sampling
+# By default the cards come in due order, new words in random order, so a tag of 900 words drowns a tag of 9.
+# A sampling policy draws the new words instead: the tag first, then a row of the tag, both in O(1) with alias tables
+# (Walker's method) or a plain randrange when the weights are equal. The tables of the tags are kept for the deck,
+# so changing the selection only builds the small table over the selected tags.
+
+SAMPLING_POLICIES = {           # policy -> label
+    "due_order": "Due order",
+    "equal_share": "Equal share per tag",
+    "frequency": "Frequent words more often",
+    "unanswered": "Skip words answered right",
+}
+DEFAULT_POLICY = "due_order"
+FREQUENCY_TAG_WEIGHTS = {       # weight of a word from the frequency tag listing it, each level twice as likely as the next one
+    "1: most frequent": 16,
+    "a: most frequent": 16,
+    "2: very frequent": 8,
+    "3: frequent": 4,
+    "4: infrequent": 2,
+    "5: rare": 1,
+}
+DEFAULT_FREQUENCY_WEIGHT = 1    # words listed under no frequency tag
+SAMPLE_TRIES = 32               # draws rejected (word not due, or answered) before falling back to the due order
+
+class AliasTable:
+
+    def __init__(self, weights):
+
+        """
+        Walker's alias table: after an O(n) build, drawing an index with probability proportional to its weight costs one randrange and one random.
+
+        Arguments:
+            weights (list): non negative weights, equal weights are used when they are all 0
+        """
+
+        count = len(weights)
+        total = sum(weights)
+        scaled = [weight * count / total for weight in weights] if total > 0 else [1.0] * count
+        self.count = count
+        self.total = total
+        self.probability = array('d', [1.0]) * count
+        self.alias = array('I', range(count))
+        small = [index for index, value in enumerate(scaled) if value < 1.0]
+        large = [index for index, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            index, other = small.pop(), large.pop()
+            self.probability[index] = scaled[index]
+            self.alias[index] = other
+            scaled[other] -= 1.0 - scaled[index]
+            (small if scaled[other] < 1.0 else large).append(other)
+
+    def draw(self, generator=random):
+        index = generator.randrange(self.count)
+        return index if generator.random() < self.probability[index] else self.alias[index]
+
+class SelectionSampler:
+
+    def __init__(self, vocabulary, selected_tags, policy, generator=random):
+
+        """
+        Draw of the rows of a selection under a sampling policy:
+            equal_share: every selected tag gets the same share, whatever its size
+            frequency: words of the frequency tags weighted by FREQUENCY_TAG_WEIGHTS, tags by the weights of their words
+            unanswered: every row the same chance, words answered right during the session are left out
+
+        Arguments:
+            vocabulary (VocabularyIndex): deck
+            selected_tags (list): tags of the selection, every tag when empty
+            policy (str): key of SAMPLING_POLICIES other than due_order
+            generator (random.Random): source of the draws
+        """
+
+        self.policy = policy
+        self.generator = generator
+        self.exclude_answered = policy == "unanswered"
+        tags = [tag for tag in dict.fromkeys(selected_tags or vocabulary.get_tags()) if len(vocabulary.tag_rows.get(tag, ()))]
+        self.tag_rows = [vocabulary.tag_rows[tag] for tag in tags]
+        self.row_tables = None          # per tag, None when the rows of a tag are equally likely
+        self.tag_table = None           # None when the tags are equally likely
+        if policy == "frequency":
+            self.row_tables = [vocabulary.frequency_table(tag) for tag in tags]
+            self.tag_table = AliasTable([table.total for table in self.row_tables])
+        elif policy == "unanswered":
+            self.tag_table = AliasTable([len(rows) for rows in self.tag_rows])       # tags by size, every row equally likely
+
+    def draw(self):
+        tag = self.tag_table.draw(self.generator) if self.tag_table is not None else self.generator.randrange(len(self.tag_rows))
+        rows = self.tag_rows[tag]
+        index = self.row_tables[tag].draw(self.generator) if self.row_tables is not None else self.generator.randrange(len(rows))
+        return rows[index]
+
+####### Spaced repetition
+# SM-2 like intervals in seconds: a word answered wrong comes back after RETRY_DELAY, a word answered right waits
+# FIRST_INTERVAL, then SECOND_INTERVAL, then its previous interval multiplied by its ease
+
+RETRY_DELAY = 30
+SKIP_DELAY = 120            # card passed with Next without being checked
+FIRST_INTERVAL = 10 * 60
+SECOND_INTERVAL = 24 * 60 * 60
+START_EASE = 2.5
+MIN_EASE = 1.3
+
+class ReviewScheduler:
+
+    def __init__(self, state_path):
+
+        """
+        Spaced repetition scheduler choosing the next card. The cards of the selection are kept in a heap keyed by due time,
+        so that taking the next card costs O(log n). The state of every word (repetitions, interval, ease, due time) is saved between sessions.
+
+        Arguments:
+            state_path (str): JSON file holding the state of the words
+        """
+
+        self.state_path = state_path
+        self.states = {}            # word_id -> [repetitions, interval, ease, due]
+        self.heap = []              # (due, random tie-break, row)
+        self.word_ids = None
+        self.sampler = None         # SelectionSampler drawing the new words, None for the due order
+        self.answered = set()
+        self.last_row = None        # card shown last, never shown twice in a row unless it is the only card
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as file:
+                self.states = json.load(file)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print("Schedule not loaded: " + str(e))
+
+    # Define function copying the states, the copy can be saved by a worker thread while the states keep changing (grade replaces the lists, never changes them)
+    def snapshot(self):
+        return dict(self.states)
+
+    # Define function saving the states (or a snapshot of them), written to a temporary file first so that a crash never leaves half of a file
+    def save(self, states=None):
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.states if states is None else states, file)
+        os.replace(temp_path, self.state_path)
+
+    # Define function returning the due time of a word, words never seen are due from the start
+    def due(self, word_id):
+        state = self.states.get(word_id)
+        return state[3] if state else 0.0
+
+    # Define function building the heap of the selected rows, new words come in random order
+    # With a sampler, only the words seen before are in the heap, the new words are drawn by the sampler
+    def start(self, rows, word_ids, sampler=None):
+        self.word_ids = word_ids
+        self.sampler = sampler
+        self.answered = set()       # words answered right during the session
+        if sampler is None:
+            self.heap = [(self.due(word_ids[row]), random.random(), row) for row in rows]
+        else:
+            self.heap = [(self.due(word_ids[row]), random.random(), row) for row in rows if word_ids[row] in self.states]
+        heapq.heapify(self.heap)
+        self.last_row = None
+
+    # Define function choosing the next card: the card due first, or with a sampler, a review that is due now and else a drawn word
+    # None when every card of the selection is out of the heap, i.e. shown or prepared, the shown card comes back when it gets graded or passed
+    def next_row(self):
+        if self.sampler is None:
+            return self._pop_earliest() if self.heap else None
+        now = time.time()
+        row = self._pop_due_review(now)
+        if row is not None:
+            return row
+        for _ in range(SAMPLE_TRIES):
+            row = self.sampler.draw()
+            word_id = self.word_ids[row]
+            if row != self.last_row and self.due(word_id) <= now and not (self.sampler.exclude_answered and word_id in self.answered):
+                self.last_row = row
+                return row
+        if self.heap:                   # most of the selection is learned, the due order takes over
+            return self._pop_earliest()
+        self.last_row = row
+        return row
+
+    # Define function taking out of the heap the review due first if it is due now, None otherwise
+    def _pop_due_review(self, now):
+        while self.heap:
+            due, tie, row = self.heap[0]
+            word_id = self.word_ids[row]
+            current_due = self.due(word_id)
+            if due != current_due:
+                heapq.heapreplace(self.heap, (current_due, tie, row))
+            elif self.sampler.exclude_answered and word_id in self.answered:
+                heapq.heappop(self.heap)        # not shown again during the session
+            elif due > now or row == self.last_row:
+                return None
+            else:
+                heapq.heappop(self.heap)
+                self.last_row = row
+                return row
+        return None
+
+    # Define function taking the card due first out of the heap
+    # A word listed under several tags has several rows, an entry whose word got graded through another row is pushed back with its new due time
+    def _pop_earliest(self):
+        held = None
+        while True:
+            due, tie, row = heapq.heappop(self.heap)
+            current_due = self.due(self.word_ids[row])
+            if due != current_due:
+                heapq.heappush(self.heap, (current_due, tie, row))
+            elif row == self.last_row and self.heap and held is None:
+                held = (due, tie, row)          # the card just shown waits for the next one
+            else:
+                break
+        if held is not None:
+            heapq.heappush(self.heap, held)
+        self.last_row = row
+        return row
+
+    # Define function updating the state of a word after an answer and putting its card back in the heap
+    def grade(self, row, correct, now=None):
+        now = time.time() if now is None else now
+        word_id = self.word_ids[row]
+        repetitions, interval, ease, due = self.states.get(word_id, [0, 0, START_EASE, 0.0])
+        if correct:
+            repetitions += 1
+            if repetitions == 1:
+                interval = FIRST_INTERVAL
+            elif repetitions == 2:
+                interval = SECOND_INTERVAL
+            else:
+                interval = interval * ease
+            ease = ease + 0.1
+        else:
+            repetitions = 0
+            interval = RETRY_DELAY
+            ease = max(MIN_EASE, ease - 0.2)
+        if correct:
+            self.answered.add(word_id)
+        self.states[word_id] = [repetitions, interval, ease, now + interval]
+        heapq.heappush(self.heap, (now + interval, random.random(), row))
+
+    # Define function putting back a card that was passed without an answer, its state stays the same
+    def requeue(self, row, now=None):
+        now = time.time() if now is None else now
+        due = max(self.due(self.word_ids[row]), now + SKIP_DELAY)
+        word_id = self.word_ids[row]
+        repetitions, interval, ease, _ = self.states.get(word_id, [0, 0, START_EASE, 0.0])
+        self.states[word_id] = [repetitions, interval, ease, due]         # a new list, a snapshot being saved keeps the old one
+        heapq.heappush(self.heap, (due, random.random(), row))
+
+    # Define function putting a card taken with next_row back in the heap unchanged, e.g. a prefetched card that was not shown
+    def put_back(self, row):
+        heapq.heappush(self.heap, (self.due(self.word_ids[row]), random.random(), row))
+
+CARD_PREFETCH = 4           # cards prepared ahead of the one shown
+
+class Card:
+
+    __slots__ = ("row", "key", "due", "prompt", "answer", "hint", "word_type", "tag", "word_id", "history")
+
+    def __init__(self, quiz, scheduler, row):
+
+        """
+        Everything shown for one card, read from the deck ahead of time so that showing it does no lookup.
+
+        Arguments:
+            quiz (QuizIndex): quiz direction of the session
+            scheduler (ReviewScheduler): scheduler the row was taken from
+            row (int): row of the deck
+        """
+
+        vocabulary = quiz.vocabulary
+        self.row = row
+        self.key = scheduler.word_ids[row]
+        self.due = scheduler.due(self.key)          # a card graded again before it is shown is dropped
+        self.prompt = quiz.prompt(row)
+        self.answer = quiz.answer(row)
+        self.hint = quiz.hint(row)
+        self.word_type = vocabulary.word_types[row]
+        self.tag = vocabulary.tags[row]
+        self.word_id = vocabulary.word_ids[row]
+        self.history = None                         # (checks, correct checks) from the review log, loaded ahead by the application
+
+class CardPipeline:
+
+    def __init__(self, quiz, scheduler, depth=CARD_PREFETCH):
+
+        """
+        Queue of the next cards of a session, taken from the scheduler and read from the deck before they are needed.
+        The application takes a card with next() and refills the queue with fill() when it is idle; the review history
+        of the queued words is asked for with missing_history() and handed back with set_history().
+
+        Arguments:
+            quiz (QuizIndex): quiz direction of the session
+            scheduler (ReviewScheduler): scheduler started on the selection
+            depth (int): number of cards kept ready
+        """
+
+        self.quiz = quiz
+        self.scheduler = scheduler
+        self.depth = depth
+        self.cards = []
+
+    # Define function preparing cards until depth cards are ready, or every card of a small selection is
+    @profiler.timed("prefetch cards")
+    def fill(self):
+        while len(self.cards) < self.depth:
+            row = self.scheduler.next_row()
+            if row is None:
+                break
+            self.cards.append(Card(self.quiz, self.scheduler, row))
+
+    # Define function returning the next card, a queued card whose word was graded meanwhile (same word under another tag) goes back to the scheduler
+    def next(self):
+        while True:
+            if not self.cards:
+                self.fill()
+            card = self.cards.pop(0)
+            if self.scheduler.due(card.key) == card.due:
+                return card
+            self.scheduler.put_back(card.row)
+
+    # Define function reading the texts of the queued cards again, after a correction
+    def refresh(self):
+        for position, card in enumerate(self.cards):
+            history = card.history
+            self.cards[position] = Card(self.quiz, self.scheduler, card.row)
+            self.cards[position].due = card.due
+            self.cards[position].history = history
+
+    def missing_history(self):
+        return [card.word_id for card in self.cards if card.history is None]
+
+    # Define function storing the history {word_id: (checks, correct checks)} asked for word_ids, a word never checked gets (0, 0)
+    def set_history(self, word_ids, history):
+        word_ids = set(word_ids)
+        for card in self.cards:
+            if card.history is None and card.word_id in word_ids:
+                card.history = history.get(card.word_id, (0, 0))
+
+
+class ReviewLog:
+
+    def __init__(self, db_path, batch_size=100, flush_interval=1.0):
+
+        """
+        Local history of the reviews, kept in SQLite: every check, reveal and correction with its word, tag, time, result and latency.
+        The Tk event loop only puts records in a queue, a writer thread inserts them in batches so logging never adds input latency.
+
+        Arguments:
+            db_path (str): path of the SQLite database
+            batch_size (int): number of records inserted in one transaction at most
+            flush_interval (float): seconds a record may wait in the queue before it gets written
+        """
+
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+
+        connection = self._connect()
+        with connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS reviews (
+                    id INTEGER PRIMARY KEY,
+                    word_id TEXT NOT NULL,
+                    tag TEXT NOT NULL,
+                    reviewed_at REAL NOT NULL,      -- unix time
+                    kind TEXT NOT NULL,             -- 'check', 'reveal' or 'correction'
+                    correct INTEGER,                -- 1 or 0 for a check, NULL otherwise
+                    revealed INTEGER NOT NULL,      -- answer shown before this event
+                    latency REAL,                   -- seconds since the card was shown
+                    answer TEXT                     -- text typed in the entry
+                )""")
+            connection.execute("CREATE INDEX IF NOT EXISTS reviews_word ON reviews (word_id, kind)")
+            connection.execute("CREATE INDEX IF NOT EXISTS reviews_tag ON reviews (tag, kind)")
+        connection.close()
+
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        import sqlite3          # only the review log needs it, imported after the window is shown
+        connection = sqlite3.connect(self.db_path)
+        connection.execute("PRAGMA journal_mode=WAL")       # readers are not blocked by the writer thread
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    # Define function recording one event, called from the Tk event loop, only puts the record in the queue
+    def record(self, word_id, tag, kind, correct=None, revealed=False, latency=None, answer=None):
+        self.queue.put((word_id, tag, time.time(), kind, correct, int(revealed), latency, answer))
+
+    # Define writer thread: waits for a first record, then gathers the following ones for up to flush_interval and inserts them in one transaction
+    def _write_loop(self):
+        connection = self._connect()
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not None]
+            running = len(records) == len(batch)            # None asks the thread to stop
+            if records:
+                try:
+                    with profiler.span("review log write"), connection:
+                        connection.executemany("INSERT INTO reviews (word_id, tag, reviewed_at, kind, correct, revealed, latency, answer) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", records)
+                except Exception as e:      # sqlite3.Error
+                    print("Error writing review history: " + str(e))
+            for _ in batch:
+                self.queue.task_done()
+        connection.close()
+
+    # Define function waiting until every queued record is written
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    # Define function returning {word_id: (checks, correct checks)}, for some words or for all of them
+    def accuracy_by_word(self, word_ids=None):
+        self.flush()
+        connection = self._connect()
+        query = "SELECT word_id, COUNT(*), SUM(correct) FROM reviews WHERE kind = 'check'"
+        if word_ids is not None:
+            word_ids = list(word_ids)
+            query += " AND word_id IN (" + ",".join("?" * len(word_ids)) + ")"
+        rows = connection.execute(query + " GROUP BY word_id", word_ids or ()).fetchall()
+        connection.close()
+        return {word_id: (checks, correct or 0) for word_id, checks, correct in rows}
+
+    # Define function returning {tag: (checks, correct checks, reveals, average latency of the checks)}
+    def accuracy_by_tag(self):
+        self.flush()
+        connection = self._connect()
+        rows = connection.execute("""
+            SELECT tag,
+                   SUM(kind = 'check'), SUM(CASE WHEN kind = 'check' THEN correct ELSE 0 END),
+                   SUM(kind = 'reveal'), AVG(CASE WHEN kind = 'check' THEN latency END)
+            FROM reviews GROUP BY tag""").fetchall()
+        connection.close()
+        return {tag: (checks, correct, reveals, latency) for tag, checks, correct, reveals, latency in rows}
+
+class TagSearchIndex:
+
+    def __init__(self, tags):
+
+        """
+        Prefix index over the words of the tag names, used by the search box of the tag selector.
+        "fre" finds "1: most frequent" and "3: frequent", "most fre" only finds the first one.
+
+        Arguments:
+            tags (list): tag names, in display order
+        """
+
+        self.tags = list(tags)
+        self.keys = sorted((word, position) for position, tag in enumerate(self.tags) for word in re.findall(r"\w+", tag.lower()))
+        self.words = [word for word, _ in self.keys]
+
+    # Define function returning the tags having a word starting with each word of the query, in display order
+    def search(self, query):
+        query_words = re.findall(r"\w+", query.lower())
+        if not query_words:
+            return list(self.tags)
+        positions = None
+        for query_word in query_words:
+            start = bisect.bisect_left(self.words, query_word)
+            end = bisect.bisect_left(self.words, query_word + "\uffff")       # end of the words starting with query_word
+            matches = {position for _, position in self.keys[start:end]}
+            positions = matches if positions is None else positions & matches
+        return [self.tags[position] for position in sorted(positions)]
@@ -0,0 +1,87 @@
+import json
+import os
+import random
+import time
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote, urlparse, parse_qs
+
+# Local stand-in for the two arwords endpoints used by csvGenerator.py, to try the scraper without touching arwords:
+#   /words/ajax_tags/<tag>   -> JSON listing of the tag, records taken from data.json (each tag gets its own overlapping subset)
+#   /words/view/<word_id>    -> HTML page holding the transliteration in <span class="chat_view">
+#
+# python arwordsStandIn.py --port 8000 --delay 0.2 --fail-rate 0.1
+# python csvGenerator.py "color" --base-url http://127.0.0.1:8000
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+def load_records():
+    with open(os.path.join(script_dir, "data.json"), 'r', encoding='utf-8') as file:
+        records = json.load(file).get("Records")
+    arabic_latin = {}
+    with open(os.path.join(script_dir, "output.json"), 'r', encoding='utf-8') as file:
+        for item in json.load(file):
+            arabic_latin[item.get("word_id")] = item.get("arabic_latin")
+    return records, arabic_latin
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    records = []
+    arabic_latin = {}
+    tag_size = 200
+    delay = 0.0
+    fail_rate = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)                          # latency of a real server
+        if random.random() < self.fail_rate:            # random failures, to exercise the retries
+            self.send_error(503)
+            return
+
+        url = urlparse(self.path)
+        segments = url.path.strip('/').split('/')
+
+        if segments[:2] == ["words", "ajax_tags"] and len(segments) == 3:
+            tag = unquote(segments[2])
+            query = parse_qs(url.query)
+            start = int(query.get("jtStartIndex", ["0"])[0])
+            size = int(query.get("jtPageSize", ["3000"])[0])
+            records = random.Random(tag).sample(self.records, min(self.tag_size, len(self.records)))      # same subset for a tag at every call
+            self._send("application/json", json.dumps({"Message" : "", "Result" : "OK", "Records" : records[start:start + size]}, ensure_ascii=False))
+
+        elif segments[:2] == ["words", "view"] and len(segments) == 3:
+            word_id = segments[2]
+            arabic_latin = self.arabic_latin.get(word_id, "w" + word_id)
+            self._send("text/html", '<html><body><span class="chat_view"> ' + arabic_latin + ' </span></body></html>')
+
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):          # keeping the console for the output of the scraper
+        pass
+
+    def _send(self, content_type, text):
+        body = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", content_type + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(port=8000, tag_size=200, delay=0.0, fail_rate=0.0):
+    StandInHandler.records, StandInHandler.arabic_latin = load_records()
+    StandInHandler.tag_size = tag_size
+    StandInHandler.delay = delay
+    StandInHandler.fail_rate = fail_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+    print("arwords stand-in on http://127.0.0.1:" + str(server.server_port))
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the arwords endpoints used by csvGenerator.py")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--tag-size", type=int, default=200, help="number of records listed for each tag")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds waited before answering each request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    args = parser.parse_args()
+    serve(args.port, args.tag_size, args.delay, args.fail_rate).serve_forever()
@@ -1,10 +1,29 @@
 import requests
 import json
-import sys
 import os
+import sys
 import csv
+import hashlib
+import time
+import random
+import threading
+import codecs
+import queue
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from urllib.parse import quote, unquote, urlparse  # for url decoding (unquote) and encoding (quote)
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import local_word_id         # one implementation of the local ids, the application finds the words by the ids written here
+
+BASE_URL = "https://www.arwords.com"    # can be pointed at a local stand-in server (see arwordsStandIn.py)
+
+HEADERS = {
+    "user-agent" : "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36 Edg/136.0.0.0"
+}
+
 def extract_tag(url):
     
     path_segments = urlparse(url).path.split('/')   
@@ -12,24 +31,296 @@ def extract_tag(url):
     decoded_tag = unquote(encoded_tag)              # decodes the url encoding, like "%20" becomes " "
     return decoded_tag
 
-def extract_arabic_latin(id):
-    
-    url = "https://www.arwords.com/words/view/" + id
+class RateLimiter:
 
-    headers = {
-    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36 Edg/136.0.0.0"
-    }
+    def __init__(self, rate):
 
-    response = requests.get(url, headers = headers)
+        """
+        Spaces the requests sent to each host, at most `rate` requests per second per host, shared by all the worker threads.
+        """
 
-    html_data = response.text
-    
-    # with open('html_data.txt', 'w', encoding='utf-8') as file:
-    #     file.write(html_data) 
-        
-    # with open('html_data.txt', 'r', encoding='utf-8') as file:
-    #     content = file.read()
-    #     print(content)
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}         # host -> time at which the next request may be sent
+
+    def wait(self, host):
+        with self.lock:             # each caller books the next free slot, then sleeps outside of the lock
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class ResponseCache:
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024, ttl=None, offline=False):
+
+        """
+        On-disk cache of the pages downloaded from arwords. Each response is stored in a file named after the hash of its URL,
+        the least recently used files are removed once the cache grows over max_bytes.
+
+        Arguments:
+            cache_dir (str): folder of the cache files
+            max_bytes (int): size limit of the cache
+            ttl (float): age in seconds after which a cached page gets downloaded again, None to keep pages forever
+            offline (bool): only answer from the cache, never from the network (expired pages are still used)
+        """
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.offline = offline
+        self.lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # files from least to most recently used, the modification date of a file is updated every time it is read
+        self.entries = OrderedDict()        # key -> size of the file
+        files = []
+        for name in os.listdir(cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            stat = os.stat(os.path.join(cache_dir, name))
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+        self.total = sum(self.entries.values())
+
+    def _key(self, url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    # Define function opening the cached body of a URL, None if it is missing or expired
+    # A cache file holds one line of JSON metadata (url, date of download) followed by the body, the returned file is positioned on the body
+    def open(self, url):
+        key = self._key(url)
+        path = os.path.join(self.cache_dir, key)
+        with self.lock:
+            if key not in self.entries:
+                return None
+            try:
+                file = open(path, 'rb')
+                meta = json.loads(file.readline())
+            except (OSError, ValueError):
+                return None
+            if self.ttl is not None and not self.offline and time.time() - meta.get("stored", 0) > self.ttl:
+                file.close()
+                return None
+            self.entries.move_to_end(key)
+            os.utime(path)
+        return file
+
+    # Define function returning the cached body of a URL, None if it is missing or expired
+    def get(self, url):
+        file = self.open(url)
+        if file is None:
+            return None
+        with file:
+            return file.read()
+
+    # Define function storing a body while it is being downloaded: the chunks are passed through and written to a temporary file,
+    # which becomes the cache entry only once the whole body went through, so that a reader never sees half of a file
+    def store(self, url, chunks):
+        key = self._key(url)
+        path = os.path.join(self.cache_dir, key)
+        size = 0
+        with open(path + ".tmp", 'wb') as file:
+            header = json.dumps({"url" : url, "stored" : time.time()}).encode('utf-8') + b"\n"
+            file.write(header)
+            size += len(header)
+            for chunk in chunks:
+                file.write(chunk)
+                size += len(chunk)
+                yield chunk
+        with self.lock:
+            os.replace(path + ".tmp", path)
+            self.total += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            while self.total > self.max_bytes and len(self.entries) > 1:
+                old_key, old_size = self.entries.popitem(last=False)
+                try:
+                    os.remove(os.path.join(self.cache_dir, old_key))
+                except OSError:
+                    pass
+                self.total -= old_size
+
+    def put(self, url, body):
+        for _ in self.store(url, [body]):
+            pass
+
+class Scraper:
+
+    def __init__(self, base_url=BASE_URL, workers=8, rate=5.0, retries=4, backoff=0.5, timeout=30, progress_path=None, cache=None):
+
+        """
+        Scraping engine for arwords: one pooled session shared by a bounded pool of worker threads, per-host rate limiting,
+        retries with exponential backoff, and a progress file so that an interrupted import resumes where it stopped.
+
+        Arguments:
+            base_url (str): address of arwords, or of a local stand-in server
+            workers (int): number of worker threads (and of pooled connections)
+            rate (float): maximum number of requests per second sent to one host
+            retries (int): number of retries of a failed request
+            backoff (float): first waiting time between retries in seconds, doubled at every retry
+            timeout (float): timeout of one request in seconds
+            progress_path (str): file in which every fetched transliteration is recorded, optional
+            cache (ResponseCache): on-disk cache of the downloaded pages, optional
+        """
+
+        self.base_url = base_url.rstrip('/')
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.progress_path = progress_path
+        self.progress_lock = threading.Lock()
+        self.cache = cache
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)     # connections are kept alive and reused by the workers
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.limiter = RateLimiter(rate)
+
+    # Define function sending a GET request, retried with backoff on connection errors, 429 and 5xx responses
+    def get(self, url, params=None, stream=False):
+        host = urlparse(url).netloc
+        for attempt in range(self.retries + 1):
+            self.limiter.wait(host)
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout, stream=stream)
+                if response.status_code != 429 and response.status_code < 500:
+                    return response
+                response.close()
+                retry_after = response.headers.get("Retry-After")
+                error = requests.HTTPError(str(response.status_code) + " for " + url, response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retry_after = None
+                error = e
+            if attempt == self.retries:
+                raise error
+            delay = self.backoff * 2 ** attempt
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            time.sleep(delay * (1 + random.random() / 2))     # jitter, so that the workers do not retry all at once
+
+    # Define function yielding the text of a page chunk by chunk while it is being read, from the cache when it holds the page
+    # Pages are cached utf-8 encoded, whatever the encoding they were sent with
+    def stream_text(self, url, params=None, chunk_size=64 * 1024):
+        full_url = requests.Request('GET', url, params=params).prepare().url     # the query string is part of the cache key
+        if self.cache is not None:
+            file = self.cache.open(full_url)
+            if file is not None:
+                decoder = codecs.getincrementaldecoder('utf-8')()
+                with file:
+                    for block in iter(lambda: file.read(chunk_size), b""):
+                        yield decoder.decode(block)
+                yield decoder.decode(b"", final=True)
+                return
+            if self.cache.offline:
+                raise LookupError("Not in the cache (offline): " + full_url)
+
+        with self.get(full_url, stream=True) as response:
+            response.raise_for_status()
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+            chunks = (decoder.decode(block) for block in response.iter_content(chunk_size))
+            if self.cache is None:
+                yield from chunks
+            else:
+                for chunk in self.cache.store(full_url, (chunk.encode('utf-8') for chunk in chunks)):
+                    yield chunk.decode('utf-8')
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+
+    # Define function returning the whole text of a page
+    def get_text(self, url, params=None):
+        return "".join(self.stream_text(url, params))
+
+    def _tag_request(self, input_tag, page_size):
+        url = self.base_url + "/words/ajax_tags/" + input_tag
+        params = {
+            "jtStartIndex" : "0",
+            "jtPageSize" : str(page_size)
+        }
+        return url, params
+
+    # Define function getting the records of a tag from the ajax_tags endpoint
+    def fetch_tag(self, input_tag, page_size=3000):
+        return json.loads(self.get_text(*self._tag_request(input_tag, page_size)))
+
+    # Define function yielding the records of a tag one by one while the listing is being downloaded
+    def stream_tag(self, input_tag, page_size=3000):
+        return iter_records(self.stream_text(*self._tag_request(input_tag, page_size)))
+
+    # Define function getting the transliteration of one word from its words/view page
+    def fetch_arabic_latin(self, word_id):
+        return parse_arabic_latin(self.get_text(self.base_url + "/words/view/" + word_id))
+
+    # Define function reading the transliterations fetched by a previous (interrupted) run
+    def load_progress(self):
+        done = {}
+        if self.progress_path and os.path.exists(self.progress_path):
+            with open(self.progress_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue                    # line cut by the interruption
+                    done[item["word_id"]] = item["arabic_latin"]
+        return done
+
+    # Define function recording a fetched transliteration, called from the worker threads
+    def record_progress(self, word_id, arabic_latin):
+        if self.progress_path:
+            with self.progress_lock:
+                with open(self.progress_path, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps({"word_id" : word_id, "arabic_latin" : arabic_latin}, ensure_ascii=False) + "\n")
+
+    # Define function fetching a transliteration and recording it in the progress file
+    def fetch_and_record(self, word_id):
+        arabic_latin = self.fetch_arabic_latin(word_id)
+        self.record_progress(word_id, arabic_latin)
+        return arabic_latin
+
+    # Define function removing the progress file once its results are written to the CSV
+    def clear_progress(self):
+        if self.progress_path and os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
+
+# Define function yielding the records of an ajax_tags response while its text arrives, without holding the whole listing in memory
+def iter_records(chunks):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = None                         # position in the buffer of the next record, None until the "Records" array is found
+    for chunk in chunks:
+        buffer += chunk
+        if position is None:
+            key = buffer.find('"Records"')
+            bracket = buffer.find('[', key) if key >= 0 else -1
+            if bracket < 0:
+                continue
+            position = bracket + 1
+        while True:
+            while position < len(buffer) and buffer[position] in ", \t\r\n":
+                position += 1
+            if position >= len(buffer):
+                break
+            if buffer[position] == ']':
+                for _ in chunks:            # reading the end of the response anyway, so that a cache entry being written gets completed
+                    pass
+                return
+            try:
+                item, position_end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                break                       # record not complete yet, waiting for the next chunk
+            yield item
+            position = position_end
+        buffer = buffer[position:]
+        position = 0
+
+def parse_arabic_latin(html_data):
     
     start_tag = '<span class="chat_view">'
     end_tag = "</span>"    
@@ -39,139 +330,233 @@ def extract_arabic_latin(id):
     except IndexError:
         return "None"
 
+def extract_arabic_latin(id, scraper=None):
+    
+    scraper = scraper or Scraper()
+    return scraper.fetch_arabic_latin(id)
+
 def demand_input_tag(tag):
     encoded_tag = quote(tag.lower().strip())
     return encoded_tag
 
-def check_tag(tag):
+class DeckKeys:
+
+    def __init__(self, csv_path):
+
+        """
+        Keys of the rows already in data.csv, read in one pass at the start of an import instead of scanning the file for every tag.
+
+        Arguments:
+            csv_path (str): path of data.csv
+        """
+
+        self.word_ids = set()
+        self.words = {}                 # (english, arabic, word_type) -> word_id of the word in the deck, a noun and a verb sharing english and arabic are two words
+        self.rows = set()               # (tag, english, arabic, word_type), a row written twice under the same tag is a duplicate
+        self.arabic_latin = {}          # word_id -> transliteration already in the deck
+
+        if os.path.exists(csv_path):
+            with open(csv_path, 'r', encoding='utf-8') as file:
+                for row in csv.DictReader(file):
+                    self.add(row.get("tag"), row.get("word_id"), row.get("english"), row.get("arabic"), row.get("word_type"), row.get("arabic_latin"))
+
+    def add(self, tag, word_id, english, arabic, word_type, arabic_latin):
+        key = word_key(english, arabic, word_type)
+        self.rows.add((tag,) + key)
+        if word_id:
+            self.words.setdefault(key, word_id)
+            self.word_ids.add(word_id)
+            self.arabic_latin[word_id] = arabic_latin
+
+    # Define function returning (word_id, transliteration) of a word already in the deck, found by its arwords word_id or by its english, arabic and word type,
+    # the word_id is the one the deck already uses so that the schedule and the corrections of the word stay on one id; None for a new word
+    def known_word(self, word_id, english, arabic, word_type):
+        if word_id not in self.word_ids:
+            word_id = self.words.get(word_key(english, arabic, word_type))
+            if word_id is None:
+                return None
+        return word_id, self.arabic_latin[word_id]
+
+# Define function returning the key of a word, the word type written without its spaces (" (n)" in data.csv and in the ps of arwords)
+def word_key(english, arabic, word_type):
+    return (english, arabic, (word_type or "").strip())
+
+# Define function importing several tags as one streaming pipeline: the records of each listing are handled while the listing downloads,
+# filtered on dia_codes, enriched with their transliteration on the worker pool and appended to data.csv as soon as they are complete,
+# so memory stays flat whatever the size of a tag and an interrupted import keeps the rows it already wrote.
+# Words already in data.csv are skipped before their transliteration gets fetched, their known transliteration is reused,
+# and a word_id shared by several tags is fetched once. Tags already in data.csv are checked again row by row, so only missing rows get added.
+def import_tags(tags, base_url = BASE_URL, workers = 8, rate = 5.0, offline = False, ttl = None, dump = False):
+
     script_dir = os.path.dirname(os.path.abspath(__file__)) 
     csv_path = os.path.join(script_dir, "data.csv")
-    with open(csv_path, 'r', encoding='utf-8') as file:
-        csv_reader = csv.DictReader(file) 
-        for row in csv_reader:
-            if unquote(tag) == row.get('tag'):
-                return 1             
-                
-def csvGenerator(temp_tag):
 
-    input_tag = demand_input_tag(temp_tag)
+    cache = ResponseCache(os.path.join(script_dir, "http_cache"), ttl = ttl, offline = offline)      # pages downloaded for other tags are not downloaded again
+    scraper = Scraper(base_url = base_url, workers = workers, rate = rate, progress_path = os.path.join(script_dir, "progress.jsonl"), cache = cache)
 
-    check = check_tag(input_tag)
+    keys = DeckKeys(csv_path)
+    fetched = scraper.load_progress()       # transliterations fetched by an interrupted run
+    waiting = {}                            # word_id -> rows waiting for its transliteration
+    finished = queue.Queue()                # (word_id, future) of the finished fetches, filled by the worker threads
+    max_in_flight = workers * 4             # bounded number of words being fetched, keeps memory flat
+    written = 0
 
-    if check == 1:
-        print("Tag already added to .csv file.")
-        input("Press Enter to exit...")
-        sys.exit(0)
+    fieldnames = ["tag", "word_type", "arabic", "english", "arabic_latin", "word_id"]
 
-    url = "https://www.arwords.com/words/ajax_tags/" + input_tag
+    # optional debug dumps, one compact JSON line per record and per written row
+    records_dump = open('data.jsonl', 'w', encoding='utf-8') if dump else None
+    rows_dump = open('output.jsonl', 'w', encoding='utf-8') if dump else None
 
-    headers = {
-    "user-agent" : "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36 Edg/136.0.0.0"
-    }
+    new_file = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
 
-    params = {
-        "jtStartIndex" : "0",
-        "jtPageSize" : "3000"
-    }
+    with open(csv_path, 'a', encoding='utf-8', newline='') as file, ThreadPoolExecutor(max_workers = workers) as pool: # newline to remove skipped lines
+        csv_writer = csv.DictWriter(file, fieldnames = fieldnames, extrasaction = 'ignore', lineterminator = '\n')  # fieldnames is an argument in DictWriter that specifies the csv columns
+        if new_file:
+            csv_writer.writeheader()
 
-    try:
-        response = requests.get(url, headers = headers, params = params)
-        if response.ok:
-            data = response.json()  
-        else:
-            sys.exit(1)   
-    except Exception:
-        sys.exit(1)  
-
-    # print(json.dumps(data, indent=2, ensure_ascii=False))
-
-    with open('data.json', 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=2)
-
-    # input("Press Enter to exit...")
-
-    new_data = []
-
-    if data.get("Records"):
-        for item in data.get("Records"):
-            new_item = {
-                "word_id" : item.get("word_id"),
-                "english" : item.get("def"),
-                "arabic" : item.get("word"),
-                "word_type" : item.get("ps"),
-                "dia_codes" : item.get("dia_codes"),
-                "arabic_latin" : extract_arabic_latin(item.get("word_id")),
-                "tag" : extract_tag(url)
-            }
-            print(new_item)
-            new_data.append(new_item)
-
-    with open("output.json", "w", encoding="utf-8") as file:
-        json.dump(new_data, file, ensure_ascii=False, indent=2)  
-        
+        def write(row):
+            nonlocal written
+            csv_writer.writerow(row)
+            file.flush()                    # the row is usable even if the import stops right after
+            keys.add(row["tag"], row["word_id"], row["english"], row["arabic"], row["word_type"], row["arabic_latin"])
+            if rows_dump:
+                rows_dump.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + "\n")
+            written += 1
+
+        def handle(word_id, future):
+            rows = waiting.pop(word_id)
+            try:
+                arabic_latin = future.result()
+            except Exception as e:
+                print("Could not fetch word " + word_id + ": " + str(e))     # its rows are left out, running the import again retries them
+                return
+            print(word_id + " " + arabic_latin)
+            for row in rows:
+                row["arabic_latin"] = arabic_latin
+                write(row)
+
+        # handles the finished fetches, waiting for some of them while more than `limit` words are in flight
+        def drain(limit):
+            while waiting:
+                try:
+                    word_id, future = finished.get(block = len(waiting) > limit)
+                except queue.Empty:
+                    return
+                handle(word_id, future)
+
+        for temp_tag in dict.fromkeys(tags):
+            input_tag = demand_input_tag(temp_tag)
+            tag = unquote(input_tag)
+            try:
+                for item in scraper.stream_tag(input_tag):
+                    if records_dump:
+                        records_dump.write(json.dumps(item, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+                    # Lebanese words (dia_codes holding 1) not already listed under the same tag
+                    row_key = (tag,) + word_key(item.get("def"), item.get("word"), item.get("ps"))
+                    if "1" not in (item.get("dia_codes") or "") or row_key in keys.rows:
+                        continue
+                    keys.rows.add(row_key)
+
+                    word_id = item.get("word_id")
+                    known = keys.known_word(word_id, item.get("def"), item.get("word"), item.get("ps"))
+                    if known is not None:
+                        word_id = known[0]          # the id the deck already has for the word
+                    row = {
+                        "tag" : tag,
+                        "word_type" : item.get("ps"),
+                        "arabic" : item.get("word"),
+                        "english" : item.get("def"),
+                        "arabic_latin" : known[1] if known is not None else fetched.get(word_id),
+                        "word_id" : word_id
+                    }
+                    if row["arabic_latin"] is not None:
+                        write(row)
+                    elif word_id in waiting:
+                        waiting[word_id].append(row)
+                    else:
+                        waiting[word_id] = [row]
+                        future = pool.submit(scraper.fetch_and_record, word_id)
+                        future.add_done_callback(lambda future, word_id = word_id: finished.put((word_id, future)))
+                    drain(max_in_flight)
+            except Exception as e:
+                print("Could not fetch tag " + tag + ": " + str(e))
+        drain(0)
+
+    for dump_file in (records_dump, rows_dump):
+        if dump_file:
+            dump_file.close()
+
+    print(str(written) + " rows added to data.csv")
+    scraper.clear_progress()
+    return written
+
+def csvGenerator(temp_tag, **options):
+    return import_tags([temp_tag], **options)
+
+# Define function reading a tags file, one tag per line, empty lines and lines starting with # are ignored
+def read_tags_file(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip() and not line.strip().startswith("#")]
+
+def fill_word_ids(json_paths, refresh=False):
+    # fills the empty word_id column of data.csv with the ids found in JSON dumps of arwords (data.json and output.json formats)
+    # words are matched on english, arabic and word type, the same english and arabic can be a noun and a verb with different ids
+    # refresh=True also gives new ids to the rows holding a local id or the arwords id of another word type
+    ids = {}
+    id_keys = {}        # arwords word_id -> (english, arabic, word_type) it was listed with
+    for json_path in json_paths:
+        with open(json_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        for item in (data.get("Records") or []) if isinstance(data, dict) else data:
+            english = item.get("english", item.get("def"))
+            arabic = item.get("arabic", item.get("word"))
+            word_type = (item.get("word_type", item.get("ps")) or "").strip()
+            ids[(english, arabic, word_type)] = item.get("word_id")
+            id_keys[item.get("word_id")] = (english, arabic, word_type)
 
     script_dir = os.path.dirname(os.path.abspath(__file__)) 
     csv_path = os.path.join(script_dir, "data.csv")
 
+    with open(csv_path, 'r', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+
     fieldnames = ["tag", "word_type", "arabic", "english", "arabic_latin", "word_id"]
 
-    with open(csv_path, 'a', encoding='utf-8', newline='') as file: # newline to remove skipped lines
-        csv_writer = csv.DictWriter(file, fieldnames = fieldnames)  # fieldnames is an argument in DictWriter that specifies the csv columns
-        for item in new_data:
-            if "1" in item.get("dia_codes"):
-                csv_writer.writerow({
-                    "tag" : item.get("tag"),
-                    "word_type" : item.get("word_type"),
-                    "arabic" : item.get("arabic"),
-                    "english" : item.get("english"),
-                    "arabic_latin" : item.get("arabic_latin")    
-                })
-
-
-
-# csvGenerator("color")
-# csvGenerator("new testament")
-# csvGenerator("finances")
-# csvGenerator("life")
-# csvGenerator("war")
-# csvGenerator("power")
-# csvGenerator("eating")
-# csvGenerator("military")
-# csvGenerator("weather")
-# csvGenerator("feelings")
-# csvGenerator("history")
-# csvGenerator("middle east")
-# csvGenerator("work")
-# csvGenerator("children")
-# csvGenerator("personality")
-# csvGenerator("law")
-# csvGenerator("family")
-# csvGenerator("cars")
-# csvGenerator("nature")
-# csvGenerator("home")
-# csvGenerator("speech")
-# csvGenerator("motion")
-# csvGenerator("society")
-# csvGenerator("health")
-# csvGenerator("money")
-# csvGenerator("government")
-# csvGenerator("time")
-# csvGenerator("people")
-# csvGenerator("relationships")
-# csvGenerator("communication")
-# csvGenerator("business")
-# csvGenerator("religion")
-# csvGenerator("politics")
-# csvGenerator("1: most frequent")
-# csvGenerator("2: very frequent")
-# csvGenerator("3: frequent")
-# csvGenerator("4: infrequent")
-# csvGenerator("5: rare")
-# csvGenerator("a: most frequent")
-# csvGenerator("arabic bible svd")
-# csvGenerator("c: frequent")
+    with open(csv_path + ".tmp", 'w', encoding='utf-8', newline='') as file:
+        csv_writer = csv.DictWriter(file, fieldnames = fieldnames, extrasaction = 'ignore', lineterminator = '\n')
+        csv_writer.writeheader()
+        for row in rows:
+            key = (row.get("english"), row.get("arabic"), (row.get("word_type") or "").strip())
+            word_id = row.get("word_id")
+            stale = refresh and word_id and (word_id.startswith("local-") or id_keys.get(word_id, key) != key)
+            if not word_id or stale:
+                row["word_id"] = ids.get(key) or local_word_id(row.get("arabic"), row.get("english"), row.get("word_type"))
+            csv_writer.writerow(row)
+    os.replace(csv_path + ".tmp", csv_path)
+
+
+
+if __name__ == "__main__":
+    # python csvGenerator.py "color" "war" --tags-file tags.txt
+    parser = argparse.ArgumentParser(description="Import arwords tags into data.csv")
+    parser.add_argument("tags", nargs="*", help="tags to import")
+    parser.add_argument("--tags-file", help="file listing the tags to import, one per line")
+    parser.add_argument("--base-url", default=BASE_URL, help="address of arwords, or of a local stand-in server")
+    parser.add_argument("--workers", type=int, default=8, help="number of concurrent downloads")
+    parser.add_argument("--rate", type=float, default=5.0, help="maximum number of requests per second")
+    parser.add_argument("--offline", action="store_true", help="only use pages already in the cache")
+    parser.add_argument("--ttl", type=float, default=None, help="age in seconds after which cached pages get downloaded again")
+    parser.add_argument("--dump", action="store_true", help="write the fetched records and the added rows to data.jsonl and output.jsonl")
+    args = parser.parse_args()
 
+    tags = list(args.tags)
+    if args.tags_file:
+        tags += read_tags_file(args.tags_file)
+    if not tags:
+        parser.error("no tags given")
 
+    import_tags(tags, base_url = args.base_url, workers = args.workers, rate = args.rate, offline = args.offline, ttl = args.ttl, dump = args.dump)
 
 #3 things to do:
 #change name of test.py // DONE
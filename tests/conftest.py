@@ -0,0 +1,42 @@
+import os
+import csv
+import sys
+
+import pytest
+
+# Tests of the headless core and of the scraper helpers, run without a display:
+#
+# python -m pytest tests
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_dir)
+sys.path.insert(0, os.path.join(root_dir, "resources"))
+
+FIELDNAMES = ["tag", "word_type", "arabic", "english", "arabic_latin", "word_id"]
+
+# a few rows with the schema of data.csv: a word listed under two tags, a noun and a verb sharing their english and arabic,
+# two transliterations of the same english (synonyms) and rows without word_id
+ROWS = [
+    {"tag": "1: most frequent", "word_type": " (n)", "arabic": "حبّ", "english": "love", "arabic_latin": "7obonn", "word_id": "9810"},
+    {"tag": "feelings", "word_type": " (n)", "arabic": "حبّ", "english": "love", "arabic_latin": "7obonn", "word_id": "9810"},
+    {"tag": "feelings", "word_type": " (v)", "arabic": "حبّ", "english": "love", "arabic_latin": "7abb", "word_id": ""},
+    {"tag": "objects", "word_type": " (n)", "arabic": "تلفون", "english": "telephone", "arabic_latin": "telefon", "word_id": "101"},
+    {"tag": "objects", "word_type": " (n)", "arabic": "تلفن", "english": "telephone", "arabic_latin": "talafon", "word_id": "102"},
+    {"tag": "colors", "word_type": " (adj)", "arabic": "أبيض", "english": "white", "arabic_latin": "2abyaD", "word_id": ""},
+]
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        csv_writer = csv.DictWriter(file, fieldnames=FIELDNAMES, lineterminator='\n')
+        csv_writer.writeheader()
+        csv_writer.writerows(rows)
+
+def read_csv(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "data.csv")
+    write_csv(path, ROWS)
+    return path
@@ -0,0 +1,159 @@
+import os
+import random
+from collections import Counter
+
+from conftest import ROWS, read_csv
+from core import (VocabularyIndex, CorrectionJournal, MappedWordStore, AliasTable, compile_deck, local_word_id, normalize_answer,
+                  grade_answer, ANSWER_CORRECT, ANSWER_NEAR_MISS, ANSWER_WRONG, DEFAULT_DIRECTION)
+
+COLUMNS = ("tags", "word_types", "english_words", "arabic_latin_words", "arabic_words", "word_ids", "normalized_answers")
+
+def columns(vocabulary):
+    return [[getattr(vocabulary, column)[row] for column in COLUMNS] for row in range(len(vocabulary.store))]
+
+def rows_of(vocabulary, english, word_type):
+    return [row for row in range(len(vocabulary.store)) if vocabulary.english_words[row] == english and vocabulary.word_types[row] == word_type]
+
+####### Correction journal
+
+def test_journal_replays_appended_records(tmp_path):
+    journal = CorrectionJournal(str(tmp_path / "data.journal"))
+    journal.append({"word_id": "a", "arabic_latin": "x"})
+    journal.append({"word_id": "b", "arabic_latin": "y"})
+    journal.close()
+    assert CorrectionJournal(journal.journal_path).replay() == [{"word_id": "a", "arabic_latin": "x"}, {"word_id": "b", "arabic_latin": "y"}]
+
+def test_journal_ignores_torn_last_line(tmp_path):
+    path = str(tmp_path / "data.journal")
+    with open(path, 'wb') as file:
+        file.write(b'{"word_id": "a", "arabic_latin": "x"}\n{"word_id": "b", "arab')
+    assert CorrectionJournal(path).replay() == [{"word_id": "a", "arabic_latin": "x"}]
+
+def test_journal_append_after_torn_line_is_kept(tmp_path):
+    path = str(tmp_path / "data.journal")
+    with open(path, 'wb') as file:
+        file.write(b'{"word_id": "a", "arabic_latin": "x"}\n{"word_id": "b", "arab')
+    journal = CorrectionJournal(path)
+    journal.append({"word_id": "c", "arabic_latin": "z"})
+    journal.close()
+    assert CorrectionJournal(path).replay() == [{"word_id": "a", "arabic_latin": "x"}, {"word_id": "c", "arabic_latin": "z"}]
+
+def test_missing_journal_replays_nothing(tmp_path):
+    assert CorrectionJournal(str(tmp_path / "data.journal")).replay() == []
+
+####### Binary deck
+
+def test_deck_round_trip(csv_path, tmp_path):
+    deck_path = str(tmp_path / "data.deck")
+    assert compile_deck(csv_path, deck_path) == len(ROWS)
+    from_csv = VocabularyIndex(csv_path)
+    from_deck = VocabularyIndex(csv_path, deck_path)
+    assert isinstance(from_deck.store, MappedWordStore)
+    assert from_deck.get_tags() == from_csv.get_tags()
+    assert from_deck.tag_counts() == from_csv.tag_counts()
+    for tag in from_csv.get_tags():
+        assert columns_of(from_deck, from_deck.select([tag])) == columns_of(from_csv, from_csv.select([tag]))
+    assert sorted(map(tuple, columns(from_deck))) == sorted(map(tuple, columns(from_csv)))
+    from_deck.store.close()
+
+def columns_of(vocabulary, rows):
+    return [tuple(getattr(vocabulary, column)[row] for column in COLUMNS) for row in rows]
+
+def test_deck_older_than_csv_is_not_used(csv_path, tmp_path):
+    deck_path = str(tmp_path / "data.deck")
+    compile_deck(csv_path, deck_path)
+    stamp = os.path.getmtime(csv_path)
+    os.utime(deck_path, (stamp - 10, stamp - 10))
+    vocabulary = VocabularyIndex(csv_path, deck_path)
+    assert not vocabulary.deck_is_current()
+    assert not isinstance(vocabulary.store, MappedWordStore)
+
+def test_local_ids_tell_word_types_apart(csv_path):
+    vocabulary = VocabularyIndex(csv_path)
+    verb_id = local_word_id("حبّ", "love", " (v)")
+    assert verb_id != local_word_id("حبّ", "love", " (n)")
+    assert vocabulary.rows_of_id(verb_id) == rows_of(vocabulary, "love", " (v)")
+    assert vocabulary.rows_of_id("9810") == rows_of(vocabulary, "love", " (n)")
+
+####### Corrections
+
+def test_compact_folds_corrections_into_csv(csv_path, tmp_path):
+    journal = CorrectionJournal(str(tmp_path / "data.journal"))
+    vocabulary = VocabularyIndex(csv_path, journal=journal)
+    vocabulary.correct(rows_of(vocabulary, "love", " (n)")[0], "7ubb")
+    vocabulary.compact()
+
+    rows = read_csv(csv_path)
+    assert [row["arabic_latin"] for row in rows if row["word_id"] == "9810"] == ["7ubb", "7ubb"]       # every tag of the word
+    assert [row["arabic_latin"] for row in rows if row["word_type"] == " (v)"] == ["7abb"]             # the verb sharing english and arabic
+    assert all(row["word_id"] for row in rows)                                                          # local ids written down
+    assert not os.path.exists(journal.journal_path)
+
+def test_corrections_are_replayed_at_load(csv_path, tmp_path):
+    journal_path = str(tmp_path / "data.journal")
+    vocabulary = VocabularyIndex(csv_path, journal=CorrectionJournal(journal_path))
+    vocabulary.correct(rows_of(vocabulary, "white", " (adj)")[0], "abyad")
+    vocabulary.journal.close()
+
+    reloaded = VocabularyIndex(csv_path, journal=CorrectionJournal(journal_path))
+    assert reloaded.arabic_latin_words[rows_of(reloaded, "white", " (adj)")[0]] == "abyad"
+    assert [row["arabic_latin"] for row in read_csv(csv_path) if row["english"] == "white"] == ["2abyaD"]         # not folded yet
+
+####### Answers
+
+def test_normalize_answer_spells_variants_one_way():
+    assert normalize_answer(" 3'ada ") == normalize_answer("ghada")
+    assert normalize_answer("5ebez") == normalize_answer("khebez")
+    assert normalize_answer("ma'2") == normalize_answer("ma22")
+    assert normalize_answer("byaDD") == normalize_answer("bya-d")
+    assert normalize_answer("chou") == "shou"
+    assert normalize_answer(None) == ""
+
+def test_grade_answer():
+    expected = normalize_answer("khebez")
+    assert grade_answer(expected, "5ebbez") == ANSWER_CORRECT
+    assert grade_answer(expected, "khebes") == ANSWER_NEAR_MISS
+    assert grade_answer(expected, "khbz") == ANSWER_WRONG
+    assert grade_answer(expected, "mayy") == ANSWER_WRONG
+
+def test_quiz_index_accepts_synonyms(csv_path):
+    vocabulary = VocabularyIndex(csv_path)
+    quiz = vocabulary.quiz_index(DEFAULT_DIRECTION)
+    telefon, talafon = rows_of(vocabulary, "telephone", " (n)")
+    assert quiz.grade(telefon, "talafon") == ANSWER_CORRECT        # answer of the other row with the same prompt
+    assert quiz.grade(talafon, "telefon") == ANSWER_CORRECT
+    assert quiz.grade(telefon, "2abyaD") == ANSWER_WRONG           # answer of a row with another prompt
+    assert quiz.grade(telefon, "telefo") == ANSWER_NEAR_MISS
+
+def test_quiz_index_follows_corrections(csv_path):
+    vocabulary = VocabularyIndex(csv_path)
+    quiz = vocabulary.quiz_index(DEFAULT_DIRECTION)
+    telefon, talafon = rows_of(vocabulary, "telephone", " (n)")
+    vocabulary.apply_correction(talafon, "tilifon")
+    assert quiz.grade(telefon, "tilifon") == ANSWER_CORRECT
+    assert quiz.grade(telefon, "talafon") == ANSWER_WRONG
+
+def test_quiz_index_english_glosses(csv_path):
+    vocabulary = VocabularyIndex(csv_path)
+    quiz = vocabulary.quiz_index("latin_to_english")
+    white = rows_of(vocabulary, "white", " (adj)")[0]
+    assert quiz.grade(white, "The White") == ANSWER_CORRECT
+    assert quiz.grade(white, "whit") == ANSWER_NEAR_MISS
+
+####### Sampling
+
+def test_alias_table_follows_weights():
+    table = AliasTable([1, 2, 3, 4, 0])
+    generator = random.Random(0)
+    draws = 100_000
+    counts = Counter(table.draw(generator) for _ in range(draws))
+    assert counts[4] == 0
+    for index, weight in enumerate([1, 2, 3, 4]):
+        assert abs(counts[index] / draws - weight / 10) < 0.01
+
+def test_alias_table_without_weight_is_uniform():
+    table = AliasTable([0, 0, 0, 0])
+    generator = random.Random(1)
+    counts = Counter(table.draw(generator) for _ in range(40_000))
+    assert sorted(counts) == [0, 1, 2, 3]
+    assert all(abs(count / 40_000 - 0.25) < 0.01 for count in counts.values())
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from conftest import ROWS, write_csv
+from csvGenerator import iter_records, DeckKeys
+
+RECORDS = [
+    {"word": "سمكة", "word_id": "15741", "def": "a fish", "ps": " (n)", "chat": "", "origin": "", "dia_codes": "1,2,3"},
+    {"word": "ختم", "word_id": "8357", "def": "stamp, [seal]", "ps": " (v)", "chat": "", "origin": "", "dia_codes": "1"},
+    {"word": "{]", "word_id": "1", "def": "braces } and ] in \"strings\"", "ps": "", "chat": "", "origin": "", "dia_codes": "2"},
+]
+RESPONSE = json.dumps({"Result": "OK", "Records": RECORDS, "TotalRecordCount": 3}, ensure_ascii=False, indent=1)
+
+def chunked(text, size):
+    return (text[start:start + size] for start in range(0, len(text), size))
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, len(RESPONSE)])
+def test_iter_records_of_chunked_response(size):
+    assert list(iter_records(chunked(RESPONSE, size))) == RECORDS
+
+def test_iter_records_of_empty_listing():
+    assert list(iter_records(chunked('{"Result": "OK", "Records": []}', 3))) == []
+
+def test_iter_records_reads_the_whole_response():
+    chunks = chunked(RESPONSE, 5)
+    list(iter_records(chunks))
+    assert next(chunks, None) is None
+
+def test_deck_keys_match_word_type(tmp_path):
+    csv_path = str(tmp_path / "data.csv")
+    write_csv(csv_path, [dict(row, word_id=row["word_id"] or "local-" + str(position)) for position, row in enumerate(ROWS)])
+    keys = DeckKeys(csv_path)
+    assert keys.known_word("9810", "love", "حبّ", " (n)") == ("9810", "7obonn")
+    assert keys.known_word("5000", "love", "حبّ", " (v)") == ("local-2", "7abb")        # the id the deck already has
+    assert keys.known_word("5001", "love", "حبّ", " (adj)") is None
@@ -1,62 +1,68 @@
 import tkinter as tk            # required to make application
-import random
 import os               # os.path allows to construct a cross-platform path
-import csv
 import sys
+import argparse
+import time
+import queue
+import math
 from tkinter import PhotoImage  # required to import images like background
+from collections import OrderedDict
+
+STARTUP_CLOCK = time.perf_counter()     # taken as the start of the application, the PyInstaller bootloader runs before it
+
+# deck, answer checking, scheduler and review history, without Tk
+from core import (profiler, VocabularyIndex, CorrectionJournal, ReviewScheduler, ReviewLog, TagSearchIndex, DirectionKeys, CardPipeline, compile_deck,
+                  ANSWER_CORRECT, ANSWER_NEAR_MISS, QUIZ_DIRECTIONS, DEFAULT_DIRECTION,
+                  SelectionSampler, SAMPLING_POLICIES, DEFAULT_POLICY)
+
+# concurrent.futures and PIL are imported where they are used, neither is needed before the first frame
+
+# Define function importing PIL on first use, None when it is not installed; the background is then scaled with PhotoImage
+def load_pil():
+    try:
+        from PIL import Image, ImageTk      # optional, smooth scaling of the background in a worker thread
+    except ImportError:
+        return None
+    return Image, ImageTk
+
+TAG_ROW_HEIGHT = 34         # height in pixels of one tag of the tag selector
 
 class TagSelector:
     
-    def __init__(self, root, start_app, tag_path):
+    def __init__(self, root, start_app, vocabulary):
         
         """
         Set up front page for the set of tags to be used for this application.
+        The list of tags is virtualized: Checkbuttons are only created for the rows visible in the canvas and reused while scrolling,
+        so the selector opens at once whatever the number of tags. A search box filters the tags as they are typed.
 
         Arguments:
             root (tk.Tk): Main application window
-            start_app   : self.setup_initialization to initialize the application after the tags are chosen
+            start_app   : self.setup_initialization to initialize the application after the tags, the quiz direction and the sampling policy are chosen
+            vocabulary (VocabularyIndex): deck already loaded in memory, shared with the application
         """
         
         self.root = root
         
         self.start_app = start_app
-        self.tag_path = tag_path
-        
-        # self.frame = tk.Frame(root, bg='')  # bg='' makes sure the frame has no background
-        # self.frame.grid(row=0, column=0, sticky="nsew")   
-        # self.frame.pack(fill='both', expand=True)   
+        self.vocabulary = vocabulary
         
-        # Create a main frame with fixed propagation
+        # Create a main frame with fixed propagation, placed over the whole window (place works next to the grid of the application widgets)
         self.main_frame = tk.Frame(self.root)
-        self.main_frame.pack(fill='both', expand=True)
-        
         self.main_frame.pack_propagate(False)
         
-        # Create a canvas with scrollbar
-        self.canvas = tk.Canvas(self.main_frame)
-        self.scrollbar = tk.Scrollbar(self.main_frame, orient="vertical", command=self.canvas.yview)
-        self.inner_frame = tk.Frame(self.canvas)
-        
-        # Configure canvas scrolling
-        self.inner_frame.bind("<Configure>", self._inner_frame_bind)
-        
-        self.canvas.create_window((0, 0), window=self.inner_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-        
-        # Pack canvas and scrollbar
-        self.canvas.pack(side="left", fill="both", expand=True)
-        self.scrollbar.pack(side="right", fill="y")
-        
-        # self.frame.grid_columnconfigure(0, weight=1)
-        # self.frame.grid_rowconfigure(0, weight=1)
-        
         self.setup_widgets()
+        self.show()
     
-    # Define function to setup up load_tags button, check buttons for every tag, and a test button for debugging purposes
+    # Define function to setup up load_tags button, search box, the virtualized list of tags, and a test button for debugging purposes
+    @profiler.timed("tag screen build")
     def setup_widgets(self):
+        self.top_frame = tk.Frame(self.main_frame)
+        self.top_frame.pack(side="top", fill="x")
+        
         # Button to load tags into app
         self.button_load_tags = tk.Button(
-            self.inner_frame, 
+            self.top_frame, 
             text="Load Tags", 
             font=("Arial", 15), 
             fg="white",                     # text color
@@ -67,25 +73,52 @@ class TagSelector:
             bd=5,                           # border width
             command=self.return_to_app 
         )
-        # self.test.grid(row=0, column=0, padx=10, pady=20, sticky="nsew")
-        self.button_load_tags.pack(padx=50, pady=50, anchor='w') 
+        self.button_load_tags.pack(padx=50, pady=(50, 10), anchor='w') 
+        
+        # Quiz direction, the cards of every direction use the same labels and entry
+        self.direction_labels = {label: direction for direction, (label, *_) in QUIZ_DIRECTIONS.items()}
+        self.direction_label = tk.StringVar(value=QUIZ_DIRECTIONS[DEFAULT_DIRECTION][0])
+        self.direction_menu = tk.OptionMenu(self.top_frame, self.direction_label, *self.direction_labels)
+        self.direction_menu.config(font=("Arial", 15))
+        self.direction_menu.pack(padx=50, pady=(0, 10), anchor='w')
+        
+        # Sampling policy, the order in which the new words of the selection come
+        self.policy_labels = {label: policy for policy, label in SAMPLING_POLICIES.items()}
+        self.policy_label = tk.StringVar(value=SAMPLING_POLICIES[DEFAULT_POLICY])
+        self.policy_menu = tk.OptionMenu(self.top_frame, self.policy_label, *self.policy_labels)
+        self.policy_menu.config(font=("Arial", 15))
+        self.policy_menu.pack(padx=50, pady=(0, 10), anchor='w')
+        
+        # Search box, the list gets filtered at every key
+        self.search_text = tk.StringVar()
+        self.search_text.trace_add("write", self._filter)
+        self.search_entry = tk.Entry(self.top_frame, textvariable=self.search_text, font=("Arial", 15))
+        self.search_entry.pack(padx=50, pady=10, fill="x")
+        
+        # Create a canvas with scrollbar, the rows are canvas windows placed at row * TAG_ROW_HEIGHT
+        self.canvas = tk.Canvas(self.main_frame, highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self.main_frame, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.bind("<Configure>", self._on_canvas_resize)
+        self._bind_mousewheel(self.canvas)
         
-        # Getting the list of unique tags through load_tags
+        # Getting the list of unique tags and their number of words through the vocabulary index
         self.tags = self.load_tags()
+        self.tag_counts = self.vocabulary.tag_counts()
+        self.search_index = TagSearchIndex(self.tags)
+        self.filtered_tags = list(self.tags)
         
-        # initializing tag_vars as a dictionary which will take a unique tag as a key and the "variable" (boolean object) as its associated variable
-        self.tag_vars = {}
+        # the checked tags are kept in a set, not in one BooleanVar per tag
+        self.selected = {tag for tag in self.tags if tag == "1: most frequent"}
         
-        for tag in self.tags:
-            value = None
-            if tag == "1: most frequent":
-                value = True
-            variable = tk.BooleanVar(value=value)
-            tk.Checkbutton(self.inner_frame, var=variable, text=tag, font=("Arial", 15)).pack(padx=50, pady=2, anchor='w')
-            self.tag_vars[tag] = variable
-        
-        self.test = tk.Button(
-            self.inner_frame, 
+        # pool of rows reused while scrolling: (Checkbutton, its BooleanVar, its canvas window), and the tag each row shows
+        self.rows = []
+        self.row_tags = []
+        
+        self.button_test = tk.Button(
+            self.top_frame, 
             text="test", 
             font=("Arial", 15), 
             fg="white",                     # text color
@@ -95,75 +128,576 @@ class TagSelector:
             relief="raised",                # border style: "flat", "raised", "sunken", "ridge", "groove"
             bd=5,                           # border width
             command=self.test 
-        ).pack()
+        )
+        self.button_test.pack(padx=50, pady=(0, 10), anchor='w')
+        
+        self._update_scrollregion()
     
     # Define test function for debugging purposes
     def test(self):
         for tag in self.tags:
-            print(self.tag_vars.get(tag).get())    
+            print(tag, tag in self.selected)    
         
-    # Define function to get list of unique tags 
+    # Define function to get list of unique tags, read from the shared vocabulary index instead of the CSV
     def load_tags(self):
-        tags = set()    # set() returns a list or array of unique tag values
-        with open(self.tag_path, 'r', encoding='utf-8') as file:
-            csv_reader = csv.DictReader(file) 
-            for row in csv_reader:
-                tags.add(row.get('tag'))
-        return sorted(tags)     # sorted to order alphabetically     
+        return self.vocabulary.get_tags()
     
-    # Define function destroying the whole frame while recalling the main application frame with the selected tags
-    def return_to_app(self):
-        selected_tags = []
-        for tag in self.tag_vars:
-            if self.tag_vars.get(tag).get():
-                selected_tags.append(tag)
-        self.main_frame.destroy()
-        self.start_app(selected_tags)
+    # Define function creating one more reusable row of the list
+    def _add_row(self):
+        slot = len(self.rows)
+        variable = tk.BooleanVar(value=False)
+        checkbutton = tk.Checkbutton(self.canvas, variable=variable, font=("Arial", 15), anchor="w", command=lambda: self._toggle(slot))
+        self._bind_mousewheel(checkbutton)
+        window = self.canvas.create_window(50, 0, window=checkbutton, anchor="nw", state="hidden")
+        self.rows.append((checkbutton, variable, window))
+        self.row_tags.append(None)
+    
+    # Define function showing in the pool of rows the tags visible in the canvas, only these rows exist as widgets
+    @profiler.timed("tag list refresh")
+    def _refresh_rows(self):
+        first = max(0, int(self.canvas.canvasy(0)) // TAG_ROW_HEIGHT)
+        visible = self.canvas.winfo_height() // TAG_ROW_HEIGHT + 2
+        while len(self.rows) < visible:
+            self._add_row()
+        for slot, (checkbutton, variable, window) in enumerate(self.rows):
+            index = first + slot
+            if index < len(self.filtered_tags):
+                tag = self.filtered_tags[index]
+                if self.row_tags[slot] != tag:
+                    checkbutton.configure(text=tag + " (" + str(self.tag_counts.get(tag, 0)) + ")")
+                    self.row_tags[slot] = tag
+                variable.set(tag in self.selected)
+                self.canvas.coords(window, 50, index * TAG_ROW_HEIGHT)
+                self.canvas.itemconfigure(window, state="normal")
+            else:
+                self.row_tags[slot] = None
+                self.canvas.itemconfigure(window, state="hidden")
+    
+    def _toggle(self, slot):
+        tag = self.row_tags[slot]
+        if self.rows[slot][1].get():
+            self.selected.add(tag)
+        else:
+            self.selected.discard(tag)
+    
+    # Define function filtering the tags with the prefix index, called at every change of the search box
+    def _filter(self, *args):
+        profiler.count("tag search key")
+        self.filtered_tags = self.search_index.search(self.search_text.get())
+        self.canvas.yview_moveto(0)
+        self._update_scrollregion()
+        self._refresh_rows()
+    
+    def _update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), len(self.filtered_tags) * TAG_ROW_HEIGHT))
     
-    def _inner_frame_bind(self, event=None):
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._refresh_rows()
+    
+    def _on_canvas_resize(self, event=None):
+        self._update_scrollregion()
+        self._refresh_rows()
+    
+    def _bind_mousewheel(self, widget):
+        widget.bind("<MouseWheel>", lambda event: self.canvas.yview_scroll(-1 if event.delta > 0 else 1, "units"))     # Windows and macOS
+        widget.bind("<Button-4>", lambda event: self.canvas.yview_scroll(-1, "units"))                                  # Linux
+        widget.bind("<Button-5>", lambda event: self.canvas.yview_scroll(1, "units"))
+    
+    # Define functions showing and hiding the tag selector, its widgets and checkbox states are kept between visits
+    def show(self):
+        self.main_frame.place(x=0, y=0, relwidth=1, relheight=1)
+        self.main_frame.lift()                  # above the application widgets
+        self.search_entry.focus_set()           # typing filters the tags, keystrokes no longer go to the entry of the application
+
+    def hide(self):
+        self.main_frame.place_forget()
+
+    # Define function hiding the frame while recalling the main application frame with the selected tags, quiz direction and sampling policy
+    def return_to_app(self):
+        selected_tags = [tag for tag in self.tags if tag in self.selected]
+        self.hide()
+        self.start_app(selected_tags, self.direction_labels[self.direction_label.get()], self.policy_labels[self.policy_label.get()])
+
+RESIZE_DELAY = 60              # ms without <Configure> event before the size of the window is applied
+
+class ResizeController:
+
+    def __init__(self, root, aspect_ratio, on_resized, delay=RESIZE_DELAY):
+
+        """
+        Keep the aspect ratio of the window without reacting to every <Configure> event.
+        While the window is dragged, each event only pushes back a single pending after job; when the events stop,
+        the final size is applied with one geometry() call and on_resized(width, height) is called once.
+        The <Configure> event caused by our own geometry() call comes back with the size already applied and is ignored,
+        so the handler never needs to be unbound.
+
+        Arguments:
+            root (tk.Tk): Main application window
+            aspect_ratio (float): width / height kept for the window
+            on_resized: called with the final width and height, e.g. to rescale the background
+            delay (int): ms of quiet before the size is applied
+        """
+
+        self.root = root
+        self.aspect_ratio = aspect_ratio
+        self.on_resized = on_resized
+        self.delay = delay
+        self.job = None                 # the pending after job, at most one
+        self.pending_size = None        # last size seen in a <Configure> event
+        self.applied_size = None        # last size handled by _apply
+        self.root.bind("<Configure>", self._on_configure)
+
+    # Define function called at every <Configure> event of the window, it only records the size and pushes back the pending job
+    def _on_configure(self, event):
+        profiler.count("configure event")
+        if event.widget is not self.root:       # <Configure> events of the child widgets reach the root binding too
+            return
+        self.pending_size = (event.width, event.height)
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+        self.job = self.root.after(self.delay, self._apply)
+
+    # Define function applying the final size, once the events have stopped
+    @profiler.timed("resize")
+    def _apply(self):
+        self.job = None
+        if self.pending_size == self.applied_size:
+            return
+        width, height = self.pending_size
+        if not self.root.attributes("-fullscreen"):         # in fullscreen the screen decides the size
+            target_height = int(width / self.aspect_ratio)
+            if height != target_height:
+                height = target_height
+                self.root.geometry(str(width) + "x" + str(height))
+        self.applied_size = (width, height)
+        self.on_resized(width, height)
+
+BACKGROUND_MAX_FACTOR = 8      # largest zoom or subsample used to scale the background without PIL
+BACKGROUND_MAX_ZOOM_PIXELS = 16_000_000     # largest zoomed image made before subsampling without PIL (64 MB), zoom 7 then subsample 8 would need 49 times the source
+BACKGROUND_SIZE_STEP = 32      # sizes are rounded up to multiples of this, so close sizes share one scaled image
+BACKGROUND_POLL_DELAY = 15     # ms between two checks of the worker thread
+BACKGROUND_CACHE_SIZE = 6      # scaled images kept, e.g. windowed and fullscreen plus a few window sizes
+
+class BackgroundRenderer:
+
+    def __init__(self, root, label, path, source=None, cache_size=BACKGROUND_CACHE_SIZE, step=BACKGROUND_SIZE_STEP):
+
+        """
+        Fit the background image to the window, covering it and cropping the overflow.
+        The image is decoded once; the scaled variants are kept in an LRU cache, so switching between windowed and fullscreen
+        shows an image that is already scaled. With PIL the image is resized in a worker thread and keyed by the quantized size,
+        only the PhotoImage is created in the event loop. Without PIL, PhotoImage zoom / subsample are used in the event loop
+        and keyed by the integer factors.
+
+        Arguments:
+            root (tk.Tk): Main application window
+            label (tk.Label): label showing the background
+            path (str): path of the image
+            source (PIL.Image): image already decoded by BackgroundRenderer.decode, e.g. in the loading thread, optional
+            cache_size (int): number of scaled images kept
+            step (int): quantization of the sizes, in pixels
+        """
+
+        self.root = root
+        self.label = label
+        self.cache_size = cache_size
+        self.step = step
+        self.cache = OrderedDict()          # key -> PhotoImage, least recently shown first
+        self.wanted = None                  # key of the last size asked for
+        self.pending = None                 # (key, future) of the resize running in the worker thread
+        self.pil = load_pil()
+        if self.pil is not None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.source = source if source is not None else self.decode(path)      # decoded once
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        else:
+            self.source = PhotoImage(file=path)
+            self.executor = None
+
+    # Define function decoding the image with PIL, Tk is not involved so it may run outside of the event loop; None without PIL
+    @staticmethod
+    def decode(path):
+        pil = load_pil()
+        if pil is None:
+            return None
+        return pil[0].open(path).convert("RGB")
+
+    # Define function showing the background for the given window size, from the cache when possible
+    @profiler.timed("background render")
+    def render(self, width, height):
+        key = self._key(width, height)
+        self.wanted = key
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self._show(key)
+        elif self.executor is not None:
+            if self.pending is None:                    # else the running resize is followed by the wanted one in _poll
+                self.pending = (key, self.executor.submit(self._scale_pil, key))
+                self.root.after(BACKGROUND_POLL_DELAY, self._poll)
+        else:
+            self._store(key, self._scale_photo(key))
+            self._show(key)
+
+    def _key(self, width, height):
+        if self.executor is not None:
+            return (-(-width // self.step) * self.step, -(-height // self.step) * self.step)      # rounded up
+        scale = max(width / self.source.width(), height / self.source.height())
+        factors = range(1, BACKGROUND_MAX_FACTOR + 1)
+        source_pixels = self.source.width() * self.source.height()
+        zooms = [zoom for zoom in factors if zoom == 1 or source_pixels * zoom * zoom <= BACKGROUND_MAX_ZOOM_PIXELS]
+        return min(((zoom, subsample) for zoom in zooms for subsample in factors), key=lambda pair: abs(pair[0] / pair[1] - scale))
+
+    # Define function run in the worker thread: resize covering the size, then crop the center
+    @profiler.timed("background scale")
+    def _scale_pil(self, key):
+        width, height = key
+        scale = max(width / self.source.width, height / self.source.height)
+        scaled_width, scaled_height = max(width, math.ceil(self.source.width * scale)), max(height, math.ceil(self.source.height * scale))
+        image = self.source.resize((scaled_width, scaled_height), self.pil[0].LANCZOS)
+        left, top = (scaled_width - width) // 2, (scaled_height - height) // 2
+        return image.crop((left, top, left + width, top + height))
+
+    def _scale_photo(self, key):
+        zoom, subsample = key
+        image = self.source
+        if zoom > 1:
+            image = image.zoom(zoom)
+        if subsample > 1:
+            image = image.subsample(subsample)
+        return image
+
+    # Define function checking the worker thread from the event loop, Tk objects are only created here
+    def _poll(self):
+        profiler.count("background poll")
+        key, future = self.pending
+        if not future.done():
+            self.root.after(BACKGROUND_POLL_DELAY, self._poll)
+            return
+        self.pending = None
+        try:
+            self._store(key, self.pil[1].PhotoImage(future.result()))
+        except Exception as e:
+            print("Background not scaled: " + str(e))
+            return
+        if key == self.wanted:
+            self._show(key)
+        else:
+            self.render(*self.wanted)       # the window changed size meanwhile
+
+    def _store(self, key, image):
+        self.cache[key] = image
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _show(self, key):
+        self.label.configure(image=self.cache[key])
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+TASK_POLL_DELAY = 20           # ms between two checks of the finished tasks
+
+class TaskRunner:
+
+    def __init__(self, root, workers=2, on_busy=None):
+
+        """
+        Run slow work (deck loading, journal writes, schedule saves) outside of the Tk event loop.
+        The functions run in a thread pool and put their result in a queue; the event loop polls the queue with root.after
+        and calls the callbacks, so the callbacks are the only place where the result meets Tk. Writes whose order matters
+        go to a serial lane with a single thread.
+
+        Arguments:
+            root (tk.Tk): Main application window
+            workers (int): threads of the pool
+            on_busy: called with True when a first task starts and with False when the last one is over, e.g. to show a loading state
+        """
+
+        from concurrent.futures import ThreadPoolExecutor
+        self.root = root
+        self.on_busy = on_busy
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.serial = ThreadPoolExecutor(max_workers=1)         # journal and schedule writes, in the order they were asked for
+        self.results = queue.Queue()        # (callback, result, error) put by the workers
+        self.running = 0                    # tasks submitted and not yet handed back to the event loop
+        self.poll_job = None
+        self.closed = False                 # set by shutdown, e.g. from a callback closing the application
+
+    # Define function running function(*args) in a worker thread, on_done(result) or on_error(error) are then called in the event loop
+    def submit(self, function, *args, on_done=None, on_error=None, serial=False):
+        self.running += 1
+        if self.running == 1 and self.on_busy is not None:
+            self.on_busy(True)
+        (self.serial if serial else self.executor).submit(self._run, function, args, on_done, on_error)
+        if self.poll_job is None:
+            self.poll_job = self.root.after(TASK_POLL_DELAY, self._poll)
+
+    # Define function run by the worker thread, nothing here touches Tk
+    def _run(self, function, args, on_done, on_error):
+        try:
+            self.results.put((on_done, function(*args), None))
+        except Exception as e:
+            self.results.put((on_error, None, e))
+
+    # Define function handing the finished tasks back to the event loop, polling stops when nothing is running
+    def _poll(self):
+        profiler.count("task poll")
+        self.poll_job = None
+        while True:
+            try:
+                callback, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.running -= 1
+            try:
+                profiler.count("task callback")
+                if error is not None:
+                    if callback is None:
+                        print("Background task failed: " + str(error))
+                    else:
+                        callback(error)
+                elif callback is not None:
+                    callback(result)
+            except Exception as e:
+                print("Error in task callback: " + str(e))
+            if self.closed:                 # the callback closed the application, the window is gone
+                return
+        if self.running:
+            self.poll_job = self.root.after(TASK_POLL_DELAY, self._poll)
+        elif self.on_busy is not None:
+            self.on_busy(False)
+
+    # Define function waiting for the submitted tasks, their callbacks are dropped
+    def shutdown(self):
+        self.closed = True
+        if self.poll_job is not None:
+            self.root.after_cancel(self.poll_job)
+            self.poll_job = None
+        self.executor.shutdown(wait=True)
+        self.serial.shutdown(wait=True)
+
+OVERLAY_REFRESH = 500          # ms between two refreshes of the performance overlay
+STARTUP_BUDGET = 0.5           # seconds allowed before the first frame gets painted
+
+class StartupTimer:
+
+    def __init__(self, budget=STARTUP_BUDGET, report=False):
+
+        """
+        Timing of the startup steps, in seconds since STARTUP_CLOCK (the import of this file).
+        The time to first paint is compared to the budget, the report is printed once the tag selector is shown.
+
+        Arguments:
+            budget (float): seconds allowed before the first paint
+            report (bool): print the report when the startup is over
+        """
+
+        self.budget = budget
+        self.report_enabled = report
+        self.marks = []             # (step, seconds), in order
+
+    def mark(self, step):
+        self.marks.append((step, time.perf_counter() - STARTUP_CLOCK))
+
+    def elapsed(self, step):
+        return dict(self.marks).get(step)
+
+    def over_budget(self):
+        first_paint = self.elapsed("first paint")
+        return first_paint is None or first_paint > self.budget
+
+    def report(self):
+        print("Startup timing, budget for the first paint " + str(round(self.budget * 1000)) + " ms:")
+        for step, seconds in self.marks:
+            print("  {:8.1f} ms  {}".format(seconds * 1000, step))
+        if self.over_budget():
+            print("  first paint over budget")
 
 class TranslatorApp:
 
-    def __init__(self, root):
+    def __init__(self, root, timer=None, exit_when_ready=False, sources=None, trace_path=None):
 
         """
         Initialize the translator application.
+        Only the window and a loading label are set up here; the deck, the schedule, the review log and the background image
+        are loaded by a thread once the first frame is painted, then the tag selector is shown.
 
         Arguments:
             root (tk.Tk): Main application window
+            timer (StartupTimer): timing of the startup, optional
+            exit_when_ready (bool): close the application as soon as the tag selector is shown, used to check the startup time
+            sources (list): other CSV, JSON or XLSX vocabulary files studied with data.csv, optional
+            trace_path (str): Chrome trace written when the application closes, the profiler is then on from the start, optional
         """
 
+        self.timer = timer if timer is not None else StartupTimer()
+        self.exit_when_ready = exit_when_ready
+        self.sources = sources or []
+        self.trace_path = trace_path
+        self.overlay = None                 # label of the performance overlay, created the first time F12 is pressed
+        self.overlay_job = None
+        if trace_path:
+            profiler.enabled = True
+
         ####### Establishing paths
         if getattr(sys, 'frozen', False):   # getattr(object, attribute_name, default(Value to return if the attribute is missing (optional)))
             self.script_dir = sys._MEIPASS  # Temp folder where PyInstaller unpacks files
+            self.state_dir = os.path.dirname(sys.executable)                         # the temp folder is deleted on exit, the study progress is kept next to the exe
         else:
             self.script_dir = os.path.dirname(os.path.abspath(__file__))             # gets absolute path of this file, then gets direcory
+            self.state_dir = os.path.join(self.script_dir, "resources")
         self.icon_path = os.path.join(self.script_dir, "resources", "icon.ico")       # Icon in the resources folder
         self.csv_path = os.path.join(self.script_dir, "resources", "data.csv")        # CSV in the resources folder
+        self.deck_path = os.path.join(self.script_dir, "resources", "data.deck")      # binary deck compiled from the CSV
+        self.journal_path = os.path.join(self.state_dir, "data.journal")              # corrections not yet folded into the CSV, replayed at every launch
+        self.schedule_path = os.path.join(self.state_dir, "schedule.json")            # spaced repetition state of every word
+        self.review_log_path = os.path.join(self.state_dir, "reviews.sqlite3")        # history of every check, reveal and correction
+        self.background_path = os.path.join(self.script_dir, "resources", "image.png")
+        self.source_cache_dir = os.path.join(self.state_dir, "deck_cache")              # parsed rows of the other sources
 
         ####### Setting up application
 
         self.root = root
         self.aspect_ratio = 9/16
         
-        ####### Setting up window and icon
+        ####### Setting up window, the icon is set after the first paint
         
         self._setup_window()
-        self._setup_icon()
         
         self.fullscreen_boolean = False
         self.root.attributes("-fullscreen", self.fullscreen_boolean)  # Fullscreen mode
         
         self.root.bind("<Escape>", self.escape_fullscreen)
         self.root.bind("<F11>", self.toggle_fullscreen)
+        self.root.bind("<F12>", self.toggle_overlay)             # performance overlay, timing spans and counters
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)     # corrections get folded into the CSV when the window is closed
         
-        ####### Creating background
+        ####### Everything else is loaded after the first frame
+        
+        self.journal = None
+        self.journal_sync_job = None
+        self.vocabulary = None
+        self.scheduler = None
+        self.review_log = None
+        self.background = None
+        self.background_source = None
+        self.tag_selector = None
+        self.widgets_created = False
+        self.applied_options = {}           # widget -> options last given to configure by _apply
+        self.prefetch_job = None
+        self.history_pending = False
+        self.loaded = False
+        self.loading_failed = False         # with exit_when_ready the application then closes and the check fails
+        
+        self.loading_label = tk.Label(self.root, text="Loading...", font=("Arial", 15))
+        self.loading_label.place(relx=0.5, rely=0.5, anchor="center")
+        self.status_label = tk.Label(self.root, text="Working...", font=("Arial", 10))      # shown while background tasks run, input is still accepted
+        self.tasks = TaskRunner(self.root, on_busy=self._show_busy)
+        self.timer.mark("window created")
+        self.root.after_idle(self._on_first_paint)     # idle callbacks run in order, the window and the label get drawn first
+        
+    # Define function called once the window is on screen: the icon is set and the deck starts loading in a worker thread
+    def _on_first_paint(self):
+        self.root.update_idletasks()        # any drawing still pending is done before the time is taken
+        self.timer.mark("first paint")
+        self._setup_icon()
+        self.tasks.submit(self._load_resources, on_done=self._on_loaded, on_error=self._on_loading_failed)
+        
+    # Define function run by a worker thread, nothing here touches Tk
+    def _load_resources(self):
+        ####### Reading the deck once, every tag selection is then taken from memory
+        journal = CorrectionJournal(self.journal_path)
+        vocabulary = VocabularyIndex(self.csv_path, self.deck_path, journal, self.sources, self.source_cache_dir)
+        scheduler = ReviewScheduler(self.schedule_path)
+        review_log = ReviewLog(self.review_log_path)
+        try:
+            background_source = BackgroundRenderer.decode(self.background_path)
+        except Exception:
+            background_source = None        # setup_background reports it
+        return journal, vocabulary, scheduler, review_log, background_source
+    
+    def _on_loading_failed(self, error):
+        self.loading_label.configure(text="Loading failed: " + str(error))
+        print("Loading failed: " + str(error))
+        self.loading_failed = True
+        if self.exit_when_ready:
+            self.on_close()
+    
+    # Define function called in the event loop once the deck is loaded, the tag selector is built here
+    def _on_loaded(self, resources):
+        self.journal, self.vocabulary, self.scheduler, self.review_log, self.background_source = resources
+        self.loaded = True
+        self.timer.mark("deck loaded")
         
+        ####### Creating background
         self.setup_background()
+        self.timer.mark("background shown")
+        
+        self.loading_label.destroy()
+        self.tag_selector = TagSelector(self.root, self.setup_initialization, self.vocabulary)     # built once, shown again by return_to_tag_selector
+        self.timer.mark("tag selector shown")
+        if self.timer.report_enabled:
+            self.timer.report()
+        if self.exit_when_ready:
+            self.on_close()
         
-        TagSelector(self.root, self.setup_initialization, self.csv_path)
+    # Define function showing the loading state in a corner while background tasks run
+    def _show_busy(self, busy):
+        if busy:
+            self.status_label.place(relx=1, rely=1, anchor="se")
+            self.status_label.lift()
+        else:
+            self.status_label.place_forget()
         
+    # Define closing of the application, the correction journal gets folded into the CSV before the window is destroyed
+    def on_close(self):
+        self.tasks.shutdown()               # pending journal writes and schedule saves are finished first
+        if self.trace_path:
+            try:
+                print("Wrote " + str(profiler.export_trace(self.trace_path)) + " spans to " + self.trace_path)
+            except Exception as e:
+                print("Error writing trace: " + str(e))
+        if not self.loaded:         # closed while loading, nothing to save
+            self.root.destroy()
+            return
+        try:
+            self.scheduler.save()
+        except Exception as e:
+            print("Error saving schedule: " + str(e))
+        if getattr(sys, 'frozen', False):       # the bundled CSV is unpacked again at every launch, the corrections stay in the journal
+            self.journal.close()
+        else:
+            try:
+                self.vocabulary.compact()
+            except Exception as e:
+                print("Error compacting corrections: " + str(e))
+        self.review_log.close()
+        if self.background is not None:
+            self.background.close()
+        self.root.destroy()
+
+    # Define function showing or hiding the performance overlay; the profiler runs while it is shown (and all along with --trace)
+    def toggle_overlay(self, event=None):
+        if self.overlay_job is not None:
+            self.root.after_cancel(self.overlay_job)
+            self.overlay_job = None
+            self.overlay.place_forget()
+            profiler.enabled = bool(self.trace_path)
+            return
+        if self.overlay is None:
+            self.overlay = tk.Label(self.root, font=("Courier", 9), fg="#7cfc00", bg="black", justify="left", anchor="nw")
+        profiler.enabled = True
+        self.overlay.place(x=0, y=0)
+        self._refresh_overlay()
+
+    def _refresh_overlay(self):
+        self.overlay.config(text="\n".join(profiler.summary()))
+        self.overlay.lift()             # above the tag selector too
+        self.overlay_job = self.root.after(OVERLAY_REFRESH, self._refresh_overlay)
+
     def escape_fullscreen(self, event=None):
         self.fullscreen_boolean = False
         self.root.attributes("-fullscreen", self.fullscreen_boolean)
@@ -175,11 +709,17 @@ class TranslatorApp:
             self.root.attributes("-fullscreen", False)
         self.fullscreen_boolean = not self.fullscreen_boolean
           
-    def setup_initialization(self, selected_tags):
+    def setup_initialization(self, selected_tags, direction=DEFAULT_DIRECTION, policy=DEFAULT_POLICY):
+
+        ####### Building the reverse index of the quiz direction in a worker the first time, it takes a while on big decks
+        if direction not in self.vocabulary.quiz_indexes:
+            self.tasks.submit(self.vocabulary.quiz_index, direction, on_done=lambda quiz: self.setup_initialization(selected_tags, direction, policy))
+            return
 
-        ####### Defining tags selected in TagSelector
+        ####### Defining tags, quiz direction and sampling policy selected in TagSelector
         self.selected_tags = selected_tags
         print(self.selected_tags)
+        self.quiz = self.vocabulary.quiz_index(direction)      # reverse index of the direction, built once per deck
         
         ####### Initialize arrays for CSV reading
         self._init_data()
@@ -187,9 +727,19 @@ class TranslatorApp:
         ####### Reading CSV
         self.load_csv_data()
 
-        ####### Creating widgets and containers
-        self.current_index = random.randint(0, len(self.english_words)-1)     # set up index
-        self.create_widgets()
+        ####### Creating widgets and containers, only the first time, they are reused afterwards
+        sampler = None if policy == DEFAULT_POLICY else SelectionSampler(self.vocabulary, selected_tags, policy)    # alias tables built once for the selection
+        self.scheduler.start(self.selected_rows, DirectionKeys(self.vocabulary.word_ids, direction), sampler)     # each direction has its own schedule
+        self.cards = CardPipeline(self.quiz, self.scheduler)        # next cards prepared ahead, from the scheduler
+        card = self.cards.next()
+        self.current_index = card.row     # set up index, which is a row number of the deck
+        if not self.widgets_created:
+            self.create_widgets()
+            self.widgets_created = True
+        # corrections are made to arabic_latin, so they are only offered when arabic_latin is the answer
+        self._apply(self.button_csv_correction, state="normal" if self.quiz.answer_column == "arabic_latin_words" else "disabled")
+        self.show_card(card)
+        self.word_entry.focus_set()
         
     ####### Defining other functions
 
@@ -200,45 +750,12 @@ class TranslatorApp:
         initial_width = 400
         initial_height = int(initial_width / self.aspect_ratio)
         self.root.geometry(str(initial_width) + "x" + str(initial_height))
-        self.root.bind("<Configure>", self._fix_aspect_ratio)
-        self._resize_active = False
-
-    #User starts resizing window
-    #<Configure> event fires
-    #_fix_aspect_ratio() is called
-    #Inside _fix_aspect_ratio:
-    #Checks if event.widget != self.root or self._resize_active → continues
-    #Sets self._resize_active = True (LOCK)
-    #Unbinds the <Configure> event (temporarily stops listening)
-    #Applies new geometry with geometry()
-    #Schedules _enable_resize_checking() to run after 10ms
-    #10ms later:
-    #_enable_resize_checking() executes:
-    #Sets self._resize_active = False (UNLOCK)
-    #Rebinds <Configure> to _fix_aspect_ratio
-
-    def _fix_aspect_ratio(self, event):
-
-        if event.widget != self.root or self._resize_active:       # indicating that fixing aspect ratio definition only occurs on the main window and when Resize is already being processed
-            return
-
-        new_width = event.width
-        new_height = int(new_width / self.aspect_ratio)
-
-        # this can create an infinite loop: User resizes window → `<Configure>` event → `geometry()` changes size → Another `<Configure>` event → `geometry()` changes size → ... (∞ loop)
-        # to avoid this we fix the size the moment the event is finished and the size of the window is different from the original size
-        if (event.height != new_height):
-            # Temporarily disable the handler to prevent recursion
-            self._resize_active = True
-            self.root.unbind("<Configure>")
-            self.root.geometry(str(new_width) + "x" + str(new_height))
-            if hasattr(self, 'bg_label'):
-                self.bg_label.place_configure(relwidth=1, relheight=1)
-            self.root.after(10, self._enable_resize_checking)  # Delay resize
+        self.resize_controller = ResizeController(self.root, self.aspect_ratio, self._on_resized)     # <Configure> events get coalesced, only the final size is applied
 
-    def _enable_resize_checking(self):
-        self._resize_active = False
-        self.root.bind("<Configure>", self._fix_aspect_ratio)
+    # Define function called by the resize controller once the size of the window has settled, the background follows the window
+    def _on_resized(self, width, height):
+        if self.background is not None:
+            self.background.render(width, height)
 
     # Defining internal function: icon setup
     def _setup_icon(self):
@@ -247,34 +764,19 @@ class TranslatorApp:
         except:
             print("Icon file not found - using default icon")
 
-    # Defining internal function: internal data structures to be used
+    # Defining internal function: internal data structures to be used, shared with the vocabulary index so that corrections are kept between tag selections
     def _init_data(self):
-        self.tags = []               # initializing arrays to get appended from csv file
-        self.word_types = []
-        self.english_words = []
-        self.arabic_latin_words = []
-        self.arabic_words = []
+        self.tags = self.vocabulary.tags
+        self.word_types = self.vocabulary.word_types
+        self.english_words = self.vocabulary.english_words
+        self.arabic_latin_words = self.vocabulary.arabic_latin_words
+        self.arabic_words = self.vocabulary.arabic_words
+        self.word_ids = self.vocabulary.word_ids
+        self.normalized_answers = self.vocabulary.normalized_answers
 
-    # Define CSV loading data
+    # Define loading data of the selected tags, taken from the vocabulary index in memory
     def load_csv_data(self):
-        try:
-            with open(self.csv_path, mode = 'r', encoding='utf-8') as file:     # mode = 'r' indicate that the file is being read # with ensures that the file gets closed at the end of the block # encoding utf-8 to read arabic letters
-                csv_reader = csv.DictReader(file)                               # DictReader reads the file as a dictionary (takes into account headers)
-                for row in csv_reader:
-                    if (row.get('tag') in self.selected_tags) or (not self.selected_tags):  # 2 conditions: if tag is in the selected tag, or if nothing cosem choose everything
-                        self.tags.append(row.get('tag'))
-                        self.word_types.append(row.get('word_type'))
-                        self.english_words.append(row.get('english'))
-                        self.arabic_latin_words.append(row.get('arabic_latin'))
-                        self.arabic_words.append(row.get('arabic'))
-                    
-        except:
-            print("CSV file not found - using sample data")     # putting sample data if there is a problem when reading the CSV
-            self.english_words = ["Hello"] * 3
-            self.arabic_latin_words = ["Marhaba"] * 3
-            self.tags = ["1: most frequent"] * 3
-            self.word_types = ["P"] * 3
-            self.arabic_words = ["مرحبا"] * 3
+        self.selected_rows = self.vocabulary.select(self.selected_tags)
 
     # Define widget creation
     def create_widgets(self):
@@ -287,20 +789,20 @@ class TranslatorApp:
         self.root.grid_columnconfigure(0, weight=2)
         self.root.grid_columnconfigure(1, weight=1)
 
-        # English word as a label
-        self.word_label = tk.Label(self.root, text=self.english_words[self.current_index], font=("Arial", 15), bg="lightblue", wraplength = 200)
+        # Prompt of the card as a label, the English word by default
+        self.word_label = tk.Label(self.root, text=self.quiz.prompt(self.current_index), font=("Arial", 15), bg="lightblue", wraplength = 200)
         self.word_label.grid(row=0, column=0, padx=10, pady=20, sticky="nsew")    # sticky sets the limits of cell, sticking the widget to the limits. nsew are coordinates, north south east west
 
         # toggle boolean counter
         self.show_is_visible = False
 
-        # Translation as a label
-        self.translation_label = tk.Label(self.root, text=self.arabic_latin_words[self.current_index], font=("Arial", 15), bg="white")
+        # Translation as a label, the expected answer
+        self.translation_label = tk.Label(self.root, text=self.quiz.answer(self.current_index), font=("Arial", 15), bg="white")
         self.translation_label.grid(row=1, column=0, padx=10, pady=20, sticky="nsew")
         self.translation_label.grid_remove()
         
-        # Translation in arabic as a label
-        self.arabic_translation_label = tk.Label(self.root, text=self.arabic_words[self.current_index], font=("Arial", 15), bg="white")
+        # Translation in arabic as a label, the remaining column shown with the answer
+        self.arabic_translation_label = tk.Label(self.root, text=self.quiz.hint(self.current_index), font=("Arial", 15), bg="white")
         self.arabic_translation_label.grid(row=2, column=0, padx=10, pady=20, sticky="nsew")
         self.arabic_translation_label.grid_remove()
 
@@ -391,122 +893,207 @@ class TranslatorApp:
 
     # Define word update functions for buttons
     def next_word(self):
-        # updating index
-        self.current_index = random.randint(0, len(self.english_words)-1)
+        profiler.count("next card")
+        # a card passed without being checked goes back in the queue unchanged
+        if not self.answer_graded:
+            self.scheduler.requeue(self.current_index)
+
+        # the card due first, already prepared by the pipeline
+        self.show_card(self.cards.next())
+
+    # Define function applying only the options that changed since the last call on the widget, one configure call per widget at most
+    def _apply(self, widget, **options):
+        applied = self.applied_options.setdefault(widget, {})
+        changed = {option: value for option, value in options.items() if applied.get(option) != value}
+        if changed:
+            widget.configure(**changed)
+            applied.update(changed)
+
+    # Define function showing a prepared card and resetting the state of the labels, entry and buttons, then preparing the next cards when idle
+    @profiler.timed("show card")
+    def show_card(self, card):
+        self.card = card
+        self.current_index = card.row
+        self.answer_graded = False                         # the first answer to a card is the one given to the scheduler
+        self.answer_revealed = False
+        self.card_shown_at = time.monotonic()              # latency of the answers is measured from here
         
-        # updating labels
-        self.word_label.config(text=self.english_words[self.current_index])   # Update label text
-        self.word_type_label.config(text=self.word_types[self.current_index]) # Update type label text
-        self.translation_label.config(text=self.arabic_latin_words[self.current_index])  # Update translation label text
-        self.arabic_translation_label.config(text=self.arabic_words[self.current_index])  # Update arabic translation label text
-        self.button_tag_selector.config(text=self.tags[self.current_index])
+        # updating labels, the word type shows how often the word was answered right
+        word_type = card.word_type
+        if card.history and card.history[0]:
+            word_type += "  " + str(card.history[1]) + "/" + str(card.history[0])
+        self._apply(self.word_label, text=card.prompt)
+        self._apply(self.word_type_label, text=word_type)
+        self._apply(self.translation_label, text=card.answer)
+        self._apply(self.arabic_translation_label, text=card.hint)
+        self._apply(self.button_tag_selector, text=card.tag)         # the same for most cards, then left untouched
         
         # Removing show labels
-        self.show_is_visible = False
-        self.translation_label.grid_remove()
-        self.arabic_translation_label.grid_remove()
-        self.button_show_hide.config(text="Show")
+        if self.show_is_visible:
+            self.show_is_visible = False
+            self.translation_label.grid_remove()
+            self.arabic_translation_label.grid_remove()
         
-        # clearing entry
-        self.word_entry.delete(0, tk.END)                            # clear word entry for next input
-        self.word_entry.config(bg="white")                           # clear word entry for next input
+        # clearing entry and resetting button states
+        if self.word_entry.get():
+            self.word_entry.delete(0, tk.END)                        # clear word entry for next input
+        self._apply(self.word_entry, bg="white")
+        self._apply(self.button_check, state="normal")
+        self._apply(self.button_show_hide, text="Show", state="normal")
         
-        # reset button state
-        self.button_check.config(state="normal")
-        self.button_show_hide.config(state="normal")  
+        if self.prefetch_job is None:
+            self.prefetch_job = self.root.after_idle(self._prefetch)
+
+    # Define function preparing the next cards once the card is drawn, and loading the history of their words in a worker
+    def _prefetch(self):
+        self.prefetch_job = None
+        self.cards.fill()
+        word_ids = self.cards.missing_history()
+        if word_ids and not self.history_pending:
+            self.history_pending = True
+            self.tasks.submit(self.review_log.accuracy_by_word, word_ids, on_done=lambda history: self._on_history(word_ids, history),
+                              on_error=self._on_history_failed)
+
+    def _on_history(self, word_ids, history):
+        self.history_pending = False
+        self.cards.set_history(word_ids, history)
+
+    def _on_history_failed(self, error):
+        self.history_pending = False
+        print("Review history not loaded: " + str(error))
 
     # define checking entry
+    @profiler.timed("check")
     def check_word(self):       
         user_input = self.word_entry.get().strip()
-        correct_answer = self.arabic_latin_words[self.current_index].lower()
-        if (user_input.lower() == correct_answer):
-            self.word_entry.config(bg="lightgreen")
-            self.button_check.config(state="disabled")
+        grade = self.quiz.grade(self.current_index, user_input)       # answers of the other rows with the same prompt are accepted too
+        is_correct = grade == ANSWER_CORRECT
+        if not self.answer_graded:
+            self.scheduler.grade(self.current_index, is_correct)
+            self.answer_graded = True
+        self._log_review("check", correct=is_correct, answer=user_input)
+        if is_correct:
+            self._apply(self.word_entry, bg="lightgreen")
+            self._apply(self.button_check, state="disabled")
             if not self.show_is_visible:
-                self.toggle_answer()     
-            self.button_show_hide.config(state="disabled")  
+                self.toggle_answer(by_user=False)     
+            self._apply(self.button_show_hide, state="disabled")
+        elif grade == ANSWER_NEAR_MISS:
+            self._apply(self.word_entry, bg="khaki")      # near miss, one letter away from the answer
         else:
-            self.word_entry.config(bg="pink")
+            self._apply(self.word_entry, bg="pink")
             
     # define returning to tag selector
     def return_to_tag_selector(self):
-        self.children = self.root.winfo_children()  # returns a list of all child widgets in a parent widget, here inside of root
-        for widget in self.children:
-            if widget != self.bg_label:
-                widget.destroy()
-        TagSelector(self.root, self.setup_initialization, self.csv_path)
-        if hasattr(self, 'bg_label'):
-            self.bg_label.lower()
+        self.tasks.submit(self.scheduler.save, self.scheduler.snapshot(), on_error=self._on_save_failed, serial=True)
+        self.tag_selector.show()      # the application widgets stay where they are, under the tag selector
     
     # define csv word correction
+    @profiler.timed("correct")
     def word_correction(self):
         corrected_word  = self.word_entry.get().strip().lower()
         
-        if not corrected_word:  # ignore if field is empty
+        if not corrected_word or self.quiz.answer_column != "arabic_latin_words":  # ignore if field is empty, or if the entry holds another column
             return
 
-        try:
-            with open(self.csv_path, 'r', encoding='utf-8') as file:
-                csv_reader = csv.DictReader(file)  
-                rows = list(csv_reader)
-                fieldnames = rows[0].keys()
+        self._apply(self.translation_label, text=corrected_word)        # the card shows the correction at once
+        self._log_review("correction", answer=corrected_word)
 
-            updated = False
-            
-            for row in rows:
-                if row['english'] == self.english_words[self.current_index]:
-                    row['arabic_latin'] = corrected_word
-                    updated = True
-                    break
-            
-            if updated:
-                with open(self.csv_path, 'w', encoding='utf-8', newline='') as file:
-                    csv_writer = csv.DictWriter(file, fieldnames=fieldnames)
-                    csv_writer.writeheader()
-                    csv_writer.writerows(rows)
-            
-            self.arabic_latin_words[self.current_index] = corrected_word
-            self.translation_label.config(text=corrected_word)
-        except Exception as e:
-            print("Error saving correction: "+ e)
+        # one line appended to the journal instead of rewriting the CSV, written even if the application closes before the rows are found
+        row = self.current_index
+        self.tasks.submit(self.journal.append, self.vocabulary.correction_record(row, corrected_word), on_error=self._on_save_failed, serial=True)
+
+        # rows of the word looked up in the serial lane, the first lookup reads every word_id of the deck; corrections keep their order
+        self.tasks.submit(self.vocabulary.rows_of_id, self.vocabulary.word_ids[row],
+                          on_done=lambda word_rows: self._on_correction_rows(row, corrected_word, word_rows), serial=True)
+
+        # forcing the journal to the disk a little later, several quick corrections then share one fsync
+        if self.journal_sync_job is None:
+            self.journal_sync_job = self.root.after(2000, self._sync_journal)
+
+    # Define function applying a correction to the rows of the word in memory once they are known
+    def _on_correction_rows(self, row, corrected_word, word_rows):
+        self.vocabulary.apply_correction(row, corrected_word, word_rows)     # rows of the deck and reverse indexes
+        self.cards.refresh()                # prepared cards of the same word under other tags
+
+    def _sync_journal(self):
+        self.journal_sync_job = None
+        self.tasks.submit(self.journal.sync, on_error=self._on_save_failed, serial=True)
+
+    def _on_save_failed(self, error):
+        print("Error saving: " + str(error))
     
-    # define toggling the answer labels
-    def toggle_answer(self):
+    # define recording an event of the current card in the review history
+    def _log_review(self, kind, correct=None, answer=None):
+        self.review_log.record(self.card.word_id, self.card.tag, kind, correct=correct,
+                               revealed=self.answer_revealed, latency=time.monotonic() - self.card_shown_at, answer=answer)
+
+    # define toggling the answer labels, by_user is False when check_word shows the answer after a right answer
+    def toggle_answer(self, by_user=True):
         if self.show_is_visible:
             self.translation_label.grid_remove()
             self.arabic_translation_label.grid_remove()
-            self.button_show_hide.config(text="Show")
+            self._apply(self.button_show_hide, text="Show")
         else:
+            if not self.answer_graded:      # showing the answer before giving one counts as a wrong answer
+                self.scheduler.grade(self.current_index, False)
+                self.answer_graded = True
+            if by_user:
+                self._log_review("reveal")
+                self.answer_revealed = True
             self.arabic_translation_label.grid()
             self.translation_label.grid()
-            self.button_show_hide.config(text="Hide")
+            self._apply(self.button_show_hide, text="Hide")
         self.show_is_visible = not self.show_is_visible
         
     # Defining the binding to Enter key ependng on the status of the entry, whether correct or not
     def binding_enter(self, event=None):     # Adding event in case Enter key on keyboard is clicked. It has to be set equal to None, because otherwise an error gets called when clicking on the button instead of typing enter, since the event is undefined otherwise
+        profiler.count("enter key")
         if self.button_check.cget("state") == "disabled":   # 
             self.next_word()
         else:
             self.check_word()
            
-    # Defining background setup
+    # Defining background setup, the image is decoded once and the renderer fits it to the window
     def setup_background(self):
         try:
-            self.background_path = os.path.join(self.script_dir, "resources", "image.png")
-            self.bg_image = PhotoImage(file=self.background_path)
-            self.bg_label = tk.Label(self.root, image=self.bg_image)
+            self.bg_label = tk.Label(self.root, bd=0)
+            self.background = BackgroundRenderer(self.root, self.bg_label, self.background_path, self.background_source)
             self.bg_label.place(x=0, y=0, relwidth=1, relheight=1)
             self.bg_label.lower()
+            self.background.render(self.root.winfo_width(), self.root.winfo_height())     # later sizes come from the resize controller
         except Exception as e:
             print("Background not loaded: " + str(e))
+            self.background = None
      
 
 ####### Creating and calling application
 
 if __name__ == "__main__":      # this is true when the script is ran directly, i.e. python .\translator.py. It's fine if this is built as an .exe
+    import multiprocessing
+    multiprocessing.freeze_support()        # the sources are parsed in worker processes, which start this exe again when frozen
+    parser = argparse.ArgumentParser(description="Translator")
+    parser.add_argument("--compile-deck", action="store_true", help="compile resources/data.csv into the binary deck resources/data.deck and exit")
+    parser.add_argument("--deck", action="append", default=[], metavar="PATH", help="other CSV, JSON or XLSX vocabulary file studied with data.csv, may be repeated; XLSX needs openpyxl")
+    parser.add_argument("--trace", metavar="PATH", help="record timing spans from the start and write them as a Chrome trace (JSON) when the application closes")
+    parser.add_argument("--startup-report", action="store_true", help="print the timing of the startup steps")
+    parser.add_argument("--startup-check", action="store_true", help="close once the tag selector is shown, exit with 1 when the first paint is over budget or the deck fails to load")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET * 1000, help="budget for the first paint, in ms")
+    args = parser.parse_args()
+
+    if args.compile_deck:       # build step, run before pyinstaller
+        resources_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+        rows = compile_deck(os.path.join(resources_dir, "data.csv"), os.path.join(resources_dir, "data.deck"))
+        print("Compiled " + str(rows) + " rows into resources/data.deck")
+        sys.exit(0)
+
+    timer = StartupTimer(args.startup_budget / 1000, report=args.startup_report or args.startup_check)
     root = tk.Tk()              # Tk() is the constructor for the top-level window
-    app = TranslatorApp(root)
+    app = TranslatorApp(root, timer, exit_when_ready=args.startup_check, sources=[os.path.abspath(path) for path in args.deck],
+                        trace_path=args.trace and os.path.abspath(args.trace))
     root.mainloop()             # the event loop is required to keep the window open, otherwise it would instanteneouslyclose
+    if args.startup_check:
+        sys.exit(1 if app.loading_failed or timer.over_budget() else 0)
 
 
 
@@ -542,12 +1129,31 @@ remaining checklist:
 14. Developping CI/CD for tool for each release // Don't know if that'll be possible
 """
 
-""" to build exe, enter the following command line:
+""" to build exe, first compile the binary deck (resources/data.deck, read instead of data.csv when it is up to date):
+
+python translator.py --compile-deck
+
+then enter the following command line:
     
-pyinstaller --onefile --windowed --icon=resources\icon.ico --add-data "resources\icon.ico;resources" --add-data "resources\data.csv;resources" --add-data "resources\image.png;resources" translator.py 
+pyinstaller --onefile --windowed --icon=resources\icon.ico --add-data "resources\icon.ico;resources" --add-data "resources\data.csv;resources" --add-data "resources\data.deck;resources" --add-data "resources\image.png;resources" translator.py 
+
+add --hidden-import openpyxl (pip install openpyxl first) so that the exe reads XLSX decks given with --deck, it is imported only when one is loaded.
+
+only the runtime files are bundled, a onefile exe unpacks all of them at every launch (data.json, output.json and Book1.xlsx are only used by the scripts).
+--onedir instead of --onefile gives a folder that starts without unpacking anything.
+
+startup timing, and a check of the first paint against a budget in ms (exit status 1 when over budget):
+
+python translator.py --startup-report
+python translator.py --startup-check --startup-budget 500
+
+the times are taken from the import of translator.py, the unpacking of a onefile exe comes before it; the CI check runs the built exe
+and also times it from launch until the tag selector is shown (build/translator.exe or build/translator/translator.exe):
+
+build/translator.exe --startup-check --startup-budget 1000
 
-or
+F12 shows the timing spans and counters; to record them from the start and open them later in chrome://tracing or https://ui.perfetto.dev:
 
-pyinstaller --onefile --windowed --icon=resources\icon.ico --add-data "resources;resources" translator.py 
+python translator.py --trace trace.json
 
 """
\ No newline at end of file